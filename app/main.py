@@ -66,6 +66,12 @@ button.undo-button image {
 
     def on_activate(app):
         win = MainWindow(application=app)
+        if os.environ.get("AUTOAI_EXIT_ON_FIRST_WINDOW"):
+            # scripts/startup_bench.py times the launch up to this line
+            def on_map(w):
+                print("autoai: first window mapped", flush=True)
+                app.quit()
+            win.connect("map", on_map)
         win.present()
 
     app.connect("activate", on_activate)
@@ -74,9 +74,26 @@ class ActionEditor(Gtk.Box):
         
         self.retries_spin = Gtk.SpinButton.new_with_range(0, 10, 1)
         self.retries_spin.set_value(3)
+
+        # find deadline; 0 falls back to the Settings default timeout
+        self.timeout_spin = Gtk.SpinButton.new_with_range(0, 600, 0.5)
+        self.timeout_spin.set_digits(1)
+        self.timeout_spin.set_value(0)
         
         self.class_combo = Gtk.ComboBoxText()
 
+        # FindAny: one check button per class, rebuilt from disk
+        self.class_checks_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        self.class_checks = {}
+
+        self.click_check = Gtk.CheckButton(label="Click the best match")
+        self.click_check.set_active(True)
+
+        # optional search region, absolute or relative to an anchor class
+        self.region_entry = Gtk.Entry()
+        self.region_entry.set_placeholder_text("x, y, width, height (empty = whole screen)")
+        self.anchor_combo = Gtk.ComboBoxText()
+
         # current action type
         self.current_type = None
 
@@ -98,7 +115,17 @@ class ActionEditor(Gtk.Box):
             self._reload_classes()
             self._add_param_row("Class Name:", self.class_combo)
             self._add_param_row("Max Retries:", self.retries_spin)
+            self._add_param_row("Timeout (s, 0 = default):", self.timeout_spin)
+            self._add_region_rows()
             
+        elif typ == "FindAny":
+            self._reload_classes()
+            self._add_param_row("Classes:", self.class_checks_box)
+            self._add_param_row("Max Retries:", self.retries_spin)
+            self._add_param_row("Timeout (s, 0 = default):", self.timeout_spin)
+            self._add_region_rows()
+            self.params_box.append(self.click_check)
+
         elif typ == "TypeText":
             self._add_param_row("Text to Type:", self.type_entry)
             
@@ -123,16 +150,41 @@ class ActionEditor(Gtk.Box):
         
         self.params_box.append(row)
 
+    def _add_region_rows(self):
+        self._add_param_row("Search Region:", self.region_entry)
+        self._add_param_row("Region Relative To:", self.anchor_combo)
+
     def _reload_classes(self):
-        """Populate class dropdown from project's classes directory."""
+        """Populate class dropdown and FindAny checks from project's classes directory."""
         self.class_combo.remove_all()
+        anchor = self.anchor_combo.get_active_text()
+        self.anchor_combo.remove_all()
+        self.anchor_combo.append_text("Screen")
         classes_dir = self.project_path / "classes"
-        
+
+        # keep FindAny selections that still exist after a reload
+        selected = {name for name, chk in self.class_checks.items() if chk.get_active()}
+        while True:
+            child = self.class_checks_box.get_first_child()
+            if child is None:
+                break
+            self.class_checks_box.remove(child)
+        self.class_checks = {}
+
         if classes_dir.exists():
             for d in sorted(classes_dir.iterdir()):
                 if d.is_dir():
                     self.class_combo.append_text(d.name)
+                    self.anchor_combo.append_text(d.name)
+                    chk = Gtk.CheckButton(label=d.name)
+                    chk.set_active(d.name in selected)
+                    self.class_checks_box.append(chk)
+                    self.class_checks[d.name] = chk
         
+        # keep the chosen anchor if its class still exists
+        names = [row[0] for row in self.anchor_combo.get_model()]
+        self.anchor_combo.set_active(names.index(anchor) if anchor in names else 0)
+
         # Set first item active if available
         if self.class_combo.get_model():
             iter_first = self.class_combo.get_model().get_iter_first()
@@ -150,7 +202,14 @@ class ActionEditor(Gtk.Box):
         elif typ == "FindAndClick":
             params["class"] = self.class_combo.get_active_text() or ""
             params["retries"] = int(self.retries_spin.get_value())
+            self._region_params(params)
             
+        elif typ == "FindAny":
+            params["classes"] = [name for name, chk in self.class_checks.items() if chk.get_active()]
+            params["retries"] = int(self.retries_spin.get_value())
+            params["click"] = bool(self.click_check.get_active())
+            self._region_params(params)
+
         elif typ == "TypeText":
             params["text"] = self.type_entry.get_text()
             
@@ -161,6 +220,21 @@ class ActionEditor(Gtk.Box):
             
         return params
 
+    def _region_params(self, params: dict):
+        if self.timeout_spin.get_value() > 0:
+            params["timeout"] = float(self.timeout_spin.get_value())
+        text = self.region_entry.get_text().strip()
+        if not text:
+            return
+        try:
+            params["region"] = [int(float(v)) for v in text.replace(",", " ").split()]
+        except ValueError:
+            # kept verbatim; the executor reports it when the step runs
+            params["region"] = text
+        anchor = self.anchor_combo.get_active_text()
+        if anchor and self.anchor_combo.get_active() > 0:
+            params["anchor"] = anchor
+
     def reload_classes_if_needed(self):
         """Public method to refresh class list from disk."""
         self._reload_classes()
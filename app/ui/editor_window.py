@@ -4,8 +4,6 @@ from gi.repository import Gtk, GLib
 
 from app.ui.workflow_editor import WorkflowEditor
 from app.ui.action_editor import ActionEditor
-from app.ui.class_panel import ClassPanel
-from app.ui.image_templates import ImageTemplates
 from app.ui.run_options import RunOptions
 import pathlib
 
@@ -112,7 +110,7 @@ class EditorWindow(Gtk.ApplicationWindow):
         action_bar.attach(action_label, 0, 0, 1, 1)
 
         self.action_combo = Gtk.ComboBoxText()
-        for action in ["Delay", "FindAndClick", "TypeText", "KeyPress"]:
+        for action in ["Delay", "FindAndClick", "FindAny", "TypeText", "KeyPress"]:
             self.action_combo.append_text(action)
         self.action_combo.set_active(0)
         action_bar.attach(self.action_combo, 1, 0, 1, 1)
@@ -136,26 +134,20 @@ class EditorWindow(Gtk.ApplicationWindow):
         workflow_label = Gtk.Label(label="Actions")
         self.notebook.append_page(workflow_tab, workflow_label)
 
-        # === TAB 2: CLASS EDITOR ===
         # Ensure action editor exists so class panel callbacks can reference it
         self.action_editor = ActionEditor(self.project_path)
 
-        # Create image templates widget so class changes can refresh both
-        self.image_templates = ImageTemplates(self.project_path)
+        # The Classes and Templates tabs are built the first time they are shown:
+        # their modules (PIL, cairo via the template labeler) are slow to import
+        self.class_panel = None
+        self.image_templates = None
+        self._lazy_pages = {}
 
-        self.class_panel = ClassPanel(
-            self.project_path,
-            on_classes_changed=lambda: (self.action_editor.reload_classes_if_needed(), self.image_templates.reload_classes_if_needed())
-        )
-        self.class_panel.set_hexpand(True)
-        self.class_panel.set_vexpand(True)
-        
-        class_label = Gtk.Label(label="Classes")
-        self.notebook.append_page(self.class_panel, class_label)
+        # === TAB 2: CLASS EDITOR ===
+        self._add_lazy_page("Classes", self._build_class_panel)
 
         # === TAB 3: IMAGE TEMPLATES ===
-        templates_label = Gtk.Label(label="Templates")
-        self.notebook.append_page(self.image_templates, templates_label)
+        self._add_lazy_page("Templates", self._build_image_templates)
 
         center.append(self.notebook)
         inner_paned.set_start_child(center)
@@ -199,8 +191,36 @@ class EditorWindow(Gtk.ApplicationWindow):
         # After UI setup, try loading the most recent workflow for this project
         self._load_existing_workflow()
 
+    def _add_lazy_page(self, label, build):
+        holder = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        holder.set_hexpand(True)
+        holder.set_vexpand(True)
+        page_num = self.notebook.append_page(holder, Gtk.Label(label=label))
+        self._lazy_pages[page_num] = (holder, build)
+
+    def _build_class_panel(self):
+        from app.ui.class_panel import ClassPanel
+        self.class_panel = ClassPanel(self.project_path, on_classes_changed=self._on_classes_changed)
+        self.class_panel.set_hexpand(True)
+        self.class_panel.set_vexpand(True)
+        return self.class_panel
+
+    def _build_image_templates(self):
+        from app.ui.image_templates import ImageTemplates
+        self.image_templates = ImageTemplates(self.project_path)
+        return self.image_templates
+
+    def _on_classes_changed(self):
+        self.action_editor.reload_classes_if_needed()
+        if self.image_templates is not None:
+            self.image_templates.reload_classes_if_needed()
+
     def _on_tab_changed(self, notebook, page, page_num):
         """Update right panel based on active tab."""
+        lazy = self._lazy_pages.pop(page_num, None)
+        if lazy is not None:
+            holder, build = lazy
+            holder.append(build())
         # When switching back to Actions tab, reload classes in case they were added
         if page_num == 0:  # Actions tab
             self.action_editor.reload_classes_if_needed()
@@ -225,6 +245,7 @@ class EditorWindow(Gtk.ApplicationWindow):
 
     def on_run(self, button):
         # Run the current workflow using the WorkflowExecutor (with dry-run option)
+        from engine.events import EventQueue, latest_by_kind
         from engine.executor import WorkflowExecutor
         from storage.workflow import Workflow
 
@@ -250,6 +271,8 @@ class EditorWindow(Gtk.ApplicationWindow):
         except Exception:
             run_options = {}
         dry = bool(self.dry_run_check.get_active())
+        # step timings are written to <project>/runs/
+        run_options['project_dir'] = str(self.project_path)
 
         # Create a dialog to show progress and allow stopping
         dlg = Gtk.Dialog(title="Running Workflow", transient_for=self, modal=True)
@@ -265,37 +288,59 @@ class EditorWindow(Gtk.ApplicationWindow):
         iteration_label.set_halign(Gtk.Align.START)
         content.append(iteration_label)
 
+        buttons = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        pause_btn = Gtk.Button(label="Pause")
+
+        def on_pause(b):
+            if executor.paused:
+                executor.resume()
+                b.set_label("Pause")
+            else:
+                executor.pause()
+                b.set_label("Resume")
+
+        pause_btn.connect("clicked", on_pause)
+        buttons.append(pause_btn)
         stop_btn = Gtk.Button(label="Stop")
         stop_btn.connect("clicked", lambda b: executor.stop())
-        content.append(stop_btn)
+        buttons.append(stop_btn)
+        content.append(buttons)
 
         dlg.present()
 
-        def on_update(msg: str):
-            # Update status label
-            GLib.idle_add(status_label.set_text, str(msg))
-            # If executor sends iteration messages like 'Starting iteration N', update iteration label
-            try:
-                if isinstance(msg, str) and msg.startswith('Starting iteration'):
-                    parts = msg.split()
-                    if len(parts) >= 3:
-                        num = parts[2].strip()
-                        GLib.idle_add(iteration_label.set_text, f"Iteration: {num}")
-                elif isinstance(msg, str) and msg.startswith('Completed iteration'):
-                    parts = msg.split()
-                    if len(parts) >= 3:
-                        num = parts[2].strip()
-                        GLib.idle_add(iteration_label.set_text, f"Completed: {num}")
-            except Exception:
-                pass
+        events = EventQueue(maxlen=256)
+        finished = {}
+
+        def drain():
+            # runs at frame rate on the main loop; a batch collapses to its newest events
+            batch = events.drain()
+            if batch:
+                latest = latest_by_kind(batch)
+                marks = [e for e in (latest.get("iteration_started"), latest.get("iteration_done")) if e]
+                if marks:
+                    iteration = max(marks, key=lambda e: (e.iteration, e.kind == "iteration_done"))
+                    prefix = "Completed" if iteration.kind == "iteration_done" else "Iteration"
+                    iteration_label.set_text(f"{prefix}: {iteration.iteration}")
+                status_label.set_text(batch[-1].text())
+            if "message" in finished:
+                status_label.set_text(f"Finished: {finished['message']}")
+                timings = executor.timings.summary()
+                if timings:
+                    summary = Gtk.Label(label="Step timings, p50/p95/p99 ms:\n" + "\n".join(timings))
+                    summary.set_halign(Gtk.Align.START)
+                    summary.set_selectable(True)
+                    content.append(summary)
+                pause_btn.set_sensitive(False)
+                stop_btn.set_sensitive(False)
+                return False
+            return True
 
         def on_finished(success: bool, message: str):
-            def _finish():
-                status_label.set_text(f"Finished: {message}")
-                return False
-            GLib.idle_add(_finish)
+            # read by drain() on the main loop
+            finished["message"] = message
 
-        executor.run(wf, dry_run=dry, options=run_options, on_update=on_update, on_finished=on_finished)
+        GLib.timeout_add(33, drain)
+        executor.run(wf, dry_run=dry, options=run_options, on_finished=on_finished, events=events)
 
     def on_save(self, button):
         # Auto-save workflow using project name (overwrite if exists)
@@ -4,7 +4,7 @@ from gi.repository import Gtk
 
 
 class RunOptions(Gtk.Frame):
-    """Widget exposing run options: loop, loop count/infinite, and delay settings."""
+    """Widget exposing run options: loop, loop count/infinite, delay and fixed-rate settings."""
 
     def __init__(self):
         super().__init__(label="Run Options")
@@ -56,6 +56,32 @@ class RunOptions(Gtk.Frame):
         delay_row.append(self.spin_delay_max)
         box.append(delay_row)
 
+        # fixed-rate mode: iterations start on a monotonic grid instead of back to back
+        self.chk_fixed_rate = Gtk.CheckButton(label="Start iterations at a fixed rate")
+        self.chk_fixed_rate.set_tooltip_text("Start each iteration every N seconds regardless of how long steps take")
+        self.chk_fixed_rate.connect("toggled", self._on_fixed_rate_toggled)
+        box.append(self.chk_fixed_rate)
+
+        rate_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        rate_row.append(Gtk.Label(label="Every:"))
+        adj_period = Gtk.Adjustment(value=30.0, lower=0.1, upper=86400.0, step_increment=1.0)
+        self.spin_period = Gtk.SpinButton(adjustment=adj_period, climb_rate=1.0, digits=1)
+        self.spin_period.set_tooltip_text("Iteration period in seconds")
+        rate_row.append(self.spin_period)
+        self.combo_policy = Gtk.ComboBoxText()
+        self.combo_policy.append("skip", "Skip missed")
+        self.combo_policy.append("catch_up", "Catch up")
+        self.combo_policy.set_active_id("skip")
+        self.combo_policy.set_tooltip_text("What to do when an iteration overruns whole periods")
+        rate_row.append(self.combo_policy)
+        rate_row.append(Gtk.Label(label="Step interval:"))
+        adj_step = Gtk.Adjustment(value=0.0, lower=0.0, upper=3600.0, step_increment=0.1)
+        self.spin_step_interval = Gtk.SpinButton(adjustment=adj_step, climb_rate=0.1, digits=2)
+        self.spin_step_interval.set_tooltip_text("Start steps this many seconds apart (0 = use the step delay)")
+        rate_row.append(self.spin_step_interval)
+        box.append(rate_row)
+        self._on_fixed_rate_toggled(None)
+
         spacer = Gtk.Box()
         try:
             spacer.set_vexpand(True)
@@ -79,6 +105,11 @@ class RunOptions(Gtk.Frame):
         except Exception:
             pass
 
+    def _on_fixed_rate_toggled(self, widget):
+        fixed = bool(self.chk_fixed_rate.get_active())
+        for w in (self.spin_period, self.combo_policy, self.spin_step_interval):
+            w.set_sensitive(fixed)
+
     def _on_random_toggled(self, widget):
         rand = bool(self.chk_random_delay.get_active())
         try:
@@ -97,6 +128,10 @@ class RunOptions(Gtk.Frame):
             'delay': float(self.spin_delay.get_value()),
             'delay_min': float(self.spin_delay_min.get_value()),
             'delay_max': float(self.spin_delay_max.get_value()),
+            'schedule': 'fixed_rate' if bool(self.chk_fixed_rate.get_active()) else 'sequential',
+            'period': float(self.spin_period.get_value()),
+            'policy': self.combo_policy.get_active_id() or 'skip',
+            'step_interval': float(self.spin_step_interval.get_value()),
         }
 
     def set_settings(self, settings: dict):
@@ -115,7 +150,16 @@ class RunOptions(Gtk.Frame):
                 self.spin_delay_min.set_value(float(settings.get('delay_min', 0.2)))
             if 'delay_max' in settings:
                 self.spin_delay_max.set_value(float(settings.get('delay_max', 1.0)))
+            if 'schedule' in settings:
+                self.chk_fixed_rate.set_active(settings.get('schedule') == 'fixed_rate')
+            if 'period' in settings:
+                self.spin_period.set_value(float(settings.get('period', 30.0)))
+            if 'policy' in settings:
+                self.combo_policy.set_active_id(settings.get('policy') or 'skip')
+            if 'step_interval' in settings:
+                self.spin_step_interval.set_value(float(settings.get('step_interval', 0.0)))
         except Exception:
             pass
+        self._on_fixed_rate_toggled(None)
         self._on_infinite_toggled(None)
         self._on_random_toggled(None)
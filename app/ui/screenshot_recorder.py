@@ -6,15 +6,7 @@ import time
 import datetime
 import os
 
-try:
-    import pyautogui
-except Exception:
-    pyautogui = None
-
-try:
-    from PIL import ImageGrab
-except Exception:
-    ImageGrab = None
+from PIL import Image
 
 
 class ScreenshotRecorder(Gtk.Window):
@@ -48,6 +40,7 @@ class ScreenshotRecorder(Gtk.Window):
 
         self._timeout_id = None
         self._running = False
+        self._source = None
 
     def _ensure_dir(self):
         dest = self.project_path / 'screenshots'
@@ -60,7 +53,10 @@ class ScreenshotRecorder(Gtk.Window):
         self._running = True
         self.btn_start.set_sensitive(False)
         self.btn_stop.set_sensitive(True)
-        self.status.set_text('Running...')
+        if self._source is None:
+            from engine.sources import get_source
+            self._source = get_source()
+        self.status.set_text('Running...' if self._source else 'No screen capture backend available')
         # schedule periodic capture every 3 seconds
         self._timeout_id = GLib.timeout_add_seconds(3, self._on_timeout)
 
@@ -83,22 +79,10 @@ class ScreenshotRecorder(Gtk.Window):
         dest = self._ensure_dir()
         ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         fname = dest / f'screenshot_{ts}.png'
+        if self._source is None:
+            return True
         try:
-            if pyautogui:
-                img = pyautogui.screenshot()
-                img.save(str(fname))
-            elif ImageGrab:
-                img = ImageGrab.grab()
-                img.save(str(fname))
-            else:
-                # try GDK fallback
-                try:
-                    gi.require_version('Gdk', '3.0')
-                except Exception:
-                    pass
-                # If all fail, write a small placeholder file
-                with open(fname, 'wb') as f:
-                    f.write(b'')
+            Image.fromarray(self._source.grab()).save(str(fname))
             self.last_saved.set_text(f'Last: {fname.name}')
             self.status.set_text(f'Saved {fname.name}')
         except Exception as e:
@@ -109,4 +93,7 @@ class ScreenshotRecorder(Gtk.Window):
     def do_destroy(self):
         # ensure timeout removed
         self.on_stop(None)
+        if self._source is not None:
+            self._source.close()
+            self._source = None
         return super().do_destroy()
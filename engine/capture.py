@@ -0,0 +1,270 @@
+"""Screen capture helpers shared by the executor and the matchers."""
+import collections
+import logging
+import threading
+import time
+import weakref
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .matching import Frame, rgb_to_gray
+
+log = logging.getLogger("autoai.capture")
+
+Box = Tuple[int, int, int, int]
+
+
+def tile_mask(changed: np.ndarray, tile: int) -> np.ndarray:
+    """Reduce a per-pixel boolean mask to one flag per `tile` x `tile` block."""
+    h, w = changed.shape
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = changed
+    return padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+
+def mask_to_boxes(mask: np.ndarray, tile: int, shape: Tuple[int, int], origin: Tuple[int, int] = (0, 0)) -> List[Box]:
+    """Merge dirty tiles into rectangles (x, y, w, h) in screen coordinates.
+
+    Horizontal runs of dirty tiles become boxes; runs with the same span on
+    consecutive tile rows are merged vertically.
+    """
+    h, w = shape
+    ox, oy = origin
+    open_runs = {}
+    boxes = []
+    for r in range(mask.shape[0]):
+        row = mask[r]
+        runs = []
+        c = 0
+        while c < len(row):
+            if row[c]:
+                start = c
+                while c < len(row) and row[c]:
+                    c += 1
+                runs.append((start, c))
+            else:
+                c += 1
+        next_open = {}
+        for span in runs:
+            top = open_runs.pop(span, r)
+            next_open[span] = top
+        # spans that did not continue on this row are closed
+        for (c0, c1), top in open_runs.items():
+            boxes.append((c0, top, c1, r))
+        open_runs = next_open
+    for (c0, c1), top in open_runs.items():
+        boxes.append((c0, top, c1, mask.shape[0]))
+
+    out = []
+    for c0, r0, c1, r1 in boxes:
+        x0, y0 = c0 * tile, r0 * tile
+        x1, y1 = min(w, c1 * tile), min(h, r1 * tile)
+        out.append((ox + x0, oy + y0, x1 - x0, y1 - y0))
+    return out
+
+
+class FrameDiffer:
+    """Tracks the previous frame and reports which tiles changed since then.
+
+    `update()` returns None when there is nothing to compare against (first
+    frame, or a frame of another size/position), otherwise the list of
+    dirty rectangles, which is empty for an unchanged screen.
+    """
+
+    def __init__(self, tile: int = 32, tolerance: float = 0.0):
+        self.tile = tile
+        # per-pixel grayscale difference ignored as noise
+        self.tolerance = tolerance
+        self._prev: Optional[np.ndarray] = None
+        self._origin = None
+
+    def reset(self):
+        self._prev = None
+        self._origin = None
+
+    def update(self, frame: Frame) -> Optional[List[Box]]:
+        gray = frame.gray
+        prev, prev_origin = self._prev, self._origin
+        self._origin = frame.origin
+        if prev is None or prev.shape != gray.shape or prev_origin != frame.origin:
+            # a private copy: captured frames may be views of reused buffers
+            self._prev = gray.copy()
+            return None
+        if self.tolerance > 0:
+            changed = np.abs(gray - prev) > self.tolerance
+        else:
+            changed = gray != prev
+        np.copyto(prev, gray)
+        if not changed.any():
+            return []
+        return mask_to_boxes(tile_mask(changed, self.tile), self.tile, gray.shape, frame.origin)
+
+
+class _Slot:
+    def __init__(self):
+        self.gray: Optional[np.ndarray] = None
+        self.rgb: Optional[np.ndarray] = None
+        self.timestamp = 0.0
+        # Frame handed out for this slot; while it is alive the slot is pinned
+        self.frame = None
+
+
+def _read_only(a: np.ndarray) -> np.ndarray:
+    view = a.view()
+    view.flags.writeable = False
+    return view
+
+
+class CaptureService:
+    """Grabs the screen on a background thread into a ring of reusable buffers.
+
+    `grab` returns a PIL image or an (h, w, 3) / (h, w) uint8 array. Each
+    grab is converted into one of `slots` preallocated buffers (float32
+    grayscale, plus the RGB pixels when `color` is set), so steady-state
+    capture allocates nothing per frame beyond what `grab` itself returns.
+
+    Consumers call `latest()` or `next_frame()` and get a `Frame` over
+    read-only views of a buffer. A slot is not overwritten while the Frame
+    handed out for it is still referenced; arrays kept past the Frame's
+    lifetime must be copied. When every slot is pinned the grab is
+    dropped, never blocking the consumer.
+    """
+
+    def __init__(self, grab: Callable[[], object], fps: float = 10.0, slots: int = 3, color: bool = False):
+        if slots < 2:
+            raise ValueError("CaptureService needs at least two slots")
+        self.grab = grab
+        self.fps = fps
+        self.color = color
+        self._slots = [_Slot() for _ in range(slots)]
+        self._latest: Optional[_Slot] = None
+        self._cond = threading.Condition()
+        self._halt = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.frames = 0
+        self.dropped = 0
+        self.errors = 0
+        # capture start times of the latest frames, for the measured frame rate
+        self._recent = collections.deque(maxlen=32)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._halt.clear()
+        self._thread = threading.Thread(target=self._loop, name="autoai-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 1.0):
+        self._halt.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def latest(self) -> Optional[Frame]:
+        """Most recent frame, or None before the first grab completes."""
+        with self._cond:
+            return self._frame_for(self._latest)
+
+    def next_frame(self, after: float, timeout: float = 1.0) -> Optional[Frame]:
+        """First frame whose capture started after monotonic time `after`.
+
+        Returns immediately when the latest frame is already new enough,
+        else waits up to `timeout` seconds (None on timeout or stop).
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest.timestamp <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._halt.is_set():
+                    return None
+                self._cond.wait(remaining)
+            return self._frame_for(self._latest)
+
+    def measured_fps(self) -> float:
+        """Frames per second actually delivered over the last few frames."""
+        with self._cond:
+            recent = list(self._recent)
+        if len(recent) < 2:
+            return 0.0
+        # measured up to now, so a stalled grabber decays towards zero
+        return (len(recent) - 1) / max(time.monotonic() - recent[0], 1e-9)
+
+    def stats(self) -> dict:
+        return {"frames": self.frames, "dropped": self.dropped, "errors": self.errors,
+                "fps": round(self.measured_fps(), 2)}
+
+    def _frame_for(self, slot: Optional[_Slot]) -> Optional[Frame]:
+        # callers hold the condition's lock
+        if slot is None:
+            return None
+        frame = slot.frame() if slot.frame is not None else None
+        if frame is None:
+            frame = Frame(gray=_read_only(slot.gray), rgb=None if slot.rgb is None else _read_only(slot.rgb),
+                          timestamp=slot.timestamp)
+            # one shared Frame per slot so consumers share its derived caches
+            slot.frame = weakref.ref(frame)
+        return frame
+
+    def _free_slot(self) -> Optional[_Slot]:
+        with self._cond:
+            for slot in self._slots:
+                if slot is self._latest:
+                    continue
+                if slot.frame is None or slot.frame() is None:
+                    slot.frame = None
+                    return slot
+        return None
+
+    def _store(self, slot: _Slot, pixels: np.ndarray):
+        shape = pixels.shape[:2]
+        want_rgb = self.color and pixels.ndim == 3
+        if slot.gray is None or slot.gray.shape != shape or want_rgb != (slot.rgb is not None):
+            # first frame, or the screen resolution changed
+            slot.gray = np.empty(shape, dtype=np.float32)
+            slot.rgb = np.empty(shape + (3,), dtype=np.uint8) if want_rgb else None
+        if pixels.ndim == 3:
+            rgb_to_gray(pixels[..., :3], out=slot.gray)
+            if slot.rgb is not None:
+                np.copyto(slot.rgb, pixels[..., :3])
+        else:
+            np.copyto(slot.gray, pixels)
+
+    def _loop(self):
+        period = 1.0 / self.fps if self.fps > 0 else 0.0
+        next_due = time.monotonic()
+        while not self._halt.is_set():
+            slot = self._free_slot()
+            if slot is None:
+                self.dropped += 1
+            else:
+                started = time.monotonic()
+                try:
+                    pixels = self.grab()
+                    if not isinstance(pixels, np.ndarray):
+                        pixels = np.asarray(pixels)
+                    self._store(slot, pixels)
+                except Exception:
+                    self.errors += 1
+                    log.debug("Screen grab failed", exc_info=True)
+                else:
+                    with self._cond:
+                        slot.timestamp = started
+                        self._latest = slot
+                        self.frames += 1
+                        self._recent.append(started)
+                        self._cond.notify_all()
+            next_due += period
+            now = time.monotonic()
+            if next_due < now:
+                # fell behind (slow grab): restart the schedule instead of bursting
+                next_due = now
+            self._halt.wait(next_due - now)
@@ -0,0 +1,155 @@
+"""Typed executor events and the bounded queue the UI drains.
+
+Events carry raw fields; text is only formatted when a listener calls
+`text()`. The executor puts events on an `EventQueue` without blocking;
+a consumer (e.g. a GTK timer at frame rate) drains them in batches and
+usually only needs the last one of each kind.
+"""
+import collections
+import threading
+from typing import Any, Deque, Dict, List, Optional
+
+
+class Event:
+    kind = "event"
+    __slots__ = ()
+
+    def text(self) -> str:
+        raise NotImplementedError
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable fields, with `kind`."""
+        out = {"kind": self.kind}
+        for cls in reversed(type(self).__mro__):
+            for name in getattr(cls, "__slots__", ()):
+                out[name] = getattr(self, name)
+        return out
+
+    def __repr__(self):
+        return f"<{self.kind}: {self.text()}>"
+
+
+class Message(Event):
+    """Free-form progress or summary line."""
+
+    kind = "message"
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def text(self) -> str:
+        return self.message
+
+
+class IterationStarted(Event):
+    kind = "iteration_started"
+    __slots__ = ("iteration",)
+
+    def __init__(self, iteration: int):
+        self.iteration = iteration
+
+    def text(self) -> str:
+        return f"Starting iteration {self.iteration}"
+
+
+class IterationDone(Event):
+    kind = "iteration_done"
+    __slots__ = ("iteration", "duration")
+
+    def __init__(self, iteration: int, duration: float):
+        self.iteration = iteration
+        self.duration = duration
+
+    def text(self) -> str:
+        return f"Completed iteration {self.iteration}"
+
+
+class StepStarted(Event):
+    kind = "step_started"
+    __slots__ = ("iteration", "step")
+
+    def __init__(self, iteration: int, step):
+        self.iteration = iteration
+        # the compiled plan step; its label is formatted once per compile
+        self.step = step
+
+    def text(self) -> str:
+        return self.step.label
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "iteration": self.iteration, "index": self.step.index, "type": self.step.type,
+                "params": self.step.params}
+
+
+class StepFinished(Event):
+    kind = "step_finished"
+    __slots__ = ("iteration", "index", "type", "duration", "output")
+
+    def __init__(self, iteration: int, index: int, stype: str, duration: float, output: Any = None):
+        self.iteration = iteration
+        self.index = index
+        self.type = stype
+        self.duration = duration
+        self.output = output
+
+    def text(self) -> str:
+        if self.output is not None:
+            return f"Step {self.index} result: {self.output}"
+        return f"Step {self.index} finished in {self.duration * 1000:.0f} ms"
+
+
+class MatchResult(Event):
+    """Outcome of a find step's search; `match` is None when nothing was found."""
+
+    kind = "match_result"
+    __slots__ = ("index", "class_name", "match", "elapsed")
+
+    def __init__(self, index: int, class_name: Optional[str], match, elapsed: float):
+        self.index = index
+        self.class_name = class_name
+        self.match = match
+        self.elapsed = elapsed
+
+    def text(self) -> str:
+        if self.match is None:
+            return f"Step {self.index}: no match after {self.elapsed * 1000:.0f} ms"
+        x, y = self.match.center
+        return (f"Step {self.index}: {self.class_name} at ({x}, {y}) score {self.match.score:.3f} "
+                f"in {self.elapsed * 1000:.0f} ms")
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {"kind": self.kind, "index": self.index, "class": self.class_name, "elapsed": self.elapsed, "match": None}
+        if self.match is not None:
+            out["match"] = {"box": list(self.match.box), "score": round(float(self.match.score), 4)}
+        return out
+
+
+class EventQueue:
+    """Bounded, thread-safe event buffer; when full the oldest events are dropped."""
+
+    def __init__(self, maxlen: int = 1024):
+        self._events: Deque[Event] = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, event: Event):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+
+    def drain(self) -> List[Event]:
+        """Remove and return everything queued, oldest first."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def __len__(self):
+        return len(self._events)
+
+
+def latest_by_kind(events: List[Event]) -> Dict[str, Event]:
+    """Coalesce a drained batch to the last event of each kind."""
+    return {e.kind: e for e in events}
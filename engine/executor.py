@@ -1,47 +1,236 @@
+import functools
 import threading
 import time
 import logging
-from typing import Callable, Optional
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 import pathlib
 
-try:
-    import pyautogui
-except Exception:
-    pyautogui = None
-
+from .events import (Event, EventQueue, IterationDone, IterationStarted, MatchResult, Message, StepFinished,
+                     StepStarted)
 from .manager import DriverManager
+from .plan import Box, FindStep, Plan, PlanError, Step, compile_plan, compile_step
+from .roi import RegionPriors
+from .schedule import FixedRateSchedule, backoff, wait_until
+from .timing import RunTimings, runs_path
+
+# the NumPy/PIL-backed modules are imported when a run first needs them, so
+# importing the executor (e.g. `python -m engine.run`) stays cheap
+if TYPE_CHECKING:
+    from .capture import CaptureService
+    from .matching import ClassMatcher, Frame, Match
+    from .sources import ScreenSource
+    from .templates import TemplateIndex
 
 log = logging.getLogger("autoai.executor")
 
 
+@functools.lru_cache(maxsize=None)
+def _pyautogui():
+    # imported on first use: pyautogui connects to the display at import time
+    try:
+        import pyautogui
+        return pyautogui
+    except Exception:
+        return None
+
+
 class WorkflowExecutor:
-    def __init__(self, driver_manager: Optional[DriverManager] = None):
+    def __init__(self, driver_manager: Optional[DriverManager] = None, matcher: Optional[str] = None,
+                 source: Optional["ScreenSource"] = None):
         self.driver_manager = driver_manager or DriverManager()
-        self._stop = False
+        # directory holding the projects (and their class templates); None uses the configured one
+        self.projects_dir: Optional[pathlib.Path] = None
+        # where frames come from; None uses the driver's screenshots (or any live source)
+        self.source = source
+        # default matcher backend; FindAndClick steps may override with params["matcher"]
+        self.matcher_name = matcher
+        # stop/pause flags; every wait in a run goes through _wait() on this condition
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._paused = False
+        self._templates: Optional["TemplateIndex"] = None
+        # last-hit search regions per class, kept across runs of this executor
+        self.roi = RegionPriors()
+        self._class_matchers: Dict[str, "ClassMatcher"] = {}
+        # workers for matching several classes against one frame (FindAny)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # outputs of steps that produce one (e.g. FindAny's winning class), by step index
+        self.step_outputs: Dict[int, dict] = {}
+        # latest match per class in the current run; anchors for relative search regions
+        self._matches: Dict[str, "Match"] = {}
+        # background screen grabber, running during a run when options["capture_fps"] > 0
+        self._capture_service: Optional["CaptureService"] = None
+        # find steps run for real but clicks and keystrokes are only logged (run option 'no_input')
+        self.no_input = False
+        # monotonic time of the last click/keystroke; frames older than it are stale
+        self._last_input = 0.0
+        # (upcoming find step, future of its speculative search)
+        self._prefetch: Optional[Tuple[FindStep, Future]] = None
+        self._prefetcher: Optional[ThreadPoolExecutor] = None
+        self.prefetch_stats = {"used": 0, "stale": 0}
+        # lateness summary of the last fixed-rate run (see engine.schedule)
+        self.schedule_stats: Dict[str, float] = {}
+        # find deadline when a step sets none (run option or the Settings "Default Timeout")
+        self.default_timeout: Optional[float] = None
+        # poll intervals between find attempts: initial, growth factor, maximum (seconds)
+        self.poll = (0.05, 2.0, 1.0)
+        # seconds from the start of each find step's search to its match, by step index
+        self.find_times: Dict[int, List[float]] = {}
+        # progress listeners of the current run
+        self._events: Optional[EventQueue] = None
+        self._on_update: Optional[Callable[[str], None]] = None
+        # capture/match/input/sleep histograms per step of the current (or last) run
+        self.timings = RunTimings()
+        # search attempts repeated after a miss and finished runs' capture counters, across runs
+        self.search_retries = 0
+        self.capture_totals = {"frames": 0, "dropped": 0, "errors": 0}
+        # Prometheus metrics, once serve_metrics() was called
+        self.metrics = None
+        self._metrics_server = None
 
     def stop(self):
-        self._stop = True
+        """Stop the run; waits in progress (delays, retries, pause) return at once."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def pause(self):
+        """Hold the run before its next input or wait; the current step's state is kept."""
+        with self._cond:
+            self._paused = True
+            self._cond.notify_all()
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep `seconds` unless stopped; returns False if the run was stopped.
+
+        Time spent paused does not count towards `seconds`.
+        """
+        started = time.perf_counter_ns()
+        try:
+            return self._wait_for(seconds)
+        finally:
+            self.timings.since("sleep", started)
+
+    def _wait_for(self, remaining: float) -> bool:
+        with self._cond:
+            while not self._stopping:
+                if self._paused:
+                    self._cond.wait()
+                    continue
+                if remaining <= 0:
+                    return True
+                t0 = time.monotonic()
+                self._cond.wait(remaining)
+                remaining -= time.monotonic() - t0
+        return False
+
+    def _checkpoint(self) -> bool:
+        """Block while paused; False once stopped."""
+        return self._wait(0)
 
-    def run(self, workflow, dry_run: bool = False, options: dict | None = None, on_update: Optional[Callable[[str], None]] = None, on_finished: Optional[Callable[[bool, str], None]] = None):
+    def run(self, workflow, dry_run: bool = False, options: dict | None = None, on_update: Optional[Callable[[str], None]] = None, on_finished: Optional[Callable[[bool, str], None]] = None,
+            events: Optional[EventQueue] = None):
         """Run workflow in background thread.
 
-        on_update(message) will be called for progress messages.
+        Progress is published as typed events (engine.events) on `events`,
+        for consumers that drain them at their own pace.
+        on_update(message) will be called with the text of every event.
         on_finished(success: bool, message: str) will be called when done.
         """
-        thread = threading.Thread(target=self._run, args=(workflow, dry_run, options or {}, on_update, on_finished), daemon=True)
+        # reset here, not in the thread: a stop() right after run() must not be lost
+        with self._cond:
+            self._stopping = False
+            self._paused = False
+        self._events = events
+        self._on_update = on_update
+        thread = threading.Thread(target=self._run, args=(workflow, dry_run, options or {}, on_finished), daemon=True)
         thread.start()
         return thread
 
-    def _run(self, workflow, dry_run, options, on_update, on_finished):
-        self._stop = False
+    def compile(self, workflow, dry_run: bool = False) -> Plan:
+        """Validate `workflow` into a step plan bound to this executor; raises PlanError."""
+        return compile_plan(workflow, self, dry_run)
+
+    def serve_metrics(self, port: int = 9464, host: str = "127.0.0.1"):
+        """Serve this executor's metrics at http://host:port/metrics (see engine.metrics)."""
+        # http.server is only imported by executors that serve metrics
+        from .metrics import ExecutorMetrics, MetricsServer
+        if self._metrics_server is None:
+            if self.metrics is None:
+                self.metrics = ExecutorMetrics(self)
+            self._metrics_server = MetricsServer(self.metrics, port, host).start()
+        return self._metrics_server
+
+    def stop_metrics(self):
+        server, self._metrics_server = self._metrics_server, None
+        if server is not None:
+            server.stop()
+
+    def capture_stats(self) -> dict:
+        """Capture counters of all runs so far, plus the live frame rate."""
+        totals = dict(self.capture_totals)
+        service = self._capture_service
+        totals["fps"] = 0.0
+        if service is not None:
+            for key in ("frames", "dropped", "errors"):
+                totals[key] += getattr(service, key)
+            if service.running:
+                totals["fps"] = service.measured_fps()
+        return totals
+
+    def _emit(self, event: Event):
+        if self.metrics is not None:
+            self.metrics.observe(event)
+        if self._events is not None:
+            self._events.put(event)
+        if self._on_update is not None:
+            # text is only formatted for listeners that want it
+            self._on_update(event.text())
+
+    def _run(self, workflow, dry_run, options, on_finished):
+        self.step_outputs = {}
+        self._matches = {}
+        self._prefetch = None
+        self.prefetch_stats = {"used": 0, "stale": 0}
+        self.find_times = {}
         drv = None
         try:
+            # list classes once per run; compiling decodes only the ones the plan uses
+            from .templates import TemplateIndex
+            self._templates = TemplateIndex(self._projects_root()).build()
+            try:
+                plan = self.compile(workflow, dry_run)
+            except PlanError as e:
+                self._emit(Message(f"Invalid workflow: {e}"))
+                if on_finished:
+                    on_finished(False, str(e))
+                return
+
             drv = self.driver_manager.get_driver()
-            if on_update:
-                on_update(f"Selected driver: {getattr(drv, '__class__', type(drv))}")
-            steps = getattr(workflow, "steps", [])
+            self._emit(Message(f"Selected driver: {getattr(drv, '__class__', type(drv))}"))
+            if options.get('metrics_port'):
+                self.serve_metrics(int(options['metrics_port']))
+            capture_fps = float(options.get('capture_fps', 0) or 0)
+            if capture_fps > 0 and not dry_run:
+                self._start_capture(drv, capture_fps)
 
-            # options: loop, infinite, loop_count, delay_mode, delay, delay_min, delay_max
+            # options: loop, infinite, loop_count, delay_mode, delay, delay_min, delay_max,
+            # schedule, period, policy, step_interval
             loop = bool(options.get('loop', False))
             infinite = bool(options.get('infinite', False))
             loop_count = int(options.get('loop_count', 1) or 1)
@@ -49,46 +238,84 @@ class WorkflowExecutor:
             delay_fixed = float(options.get('delay', 0.0) or 0.0)
             delay_min = float(options.get('delay_min', 0.0) or 0.0)
             delay_max = float(options.get('delay_max', 0.0) or 0.0)
+            prefetch = bool(options.get('prefetch', True)) and not dry_run
+            self.no_input = bool(options.get('no_input', False))
+            self.default_timeout = self._configured_timeout(options)
+            self.poll = (float(options.get('poll_initial', 0.05)), float(options.get('poll_factor', 2.0)),
+                         float(options.get('poll_max', 1.0)))
+            # schedule: 'sequential' (default) runs iterations back to back; 'fixed_rate'
+            # starts one every `period` seconds, optionally each step `step_interval` apart
+            schedule = None
+            step_interval = 0.0
+            if options.get('schedule') == 'fixed_rate':
+                schedule = FixedRateSchedule(float(options.get('period', 0) or 0), options.get('policy', 'skip'))
+                step_interval = max(0.0, float(options.get('step_interval', 0.0) or 0.0))
+                schedule.start()
+            step_lateness: List[float] = []
+            self.schedule_stats = {}
+            runs_dir = None if dry_run else self._project_dir(workflow, options)
+            self.timings = RunTimings(runs_path(runs_dir) if runs_dir else None,
+                                      flush_every=float(options.get('timings_flush', 10.0)))
 
             iteration = 0
             while True:
                 iteration += 1
-                if self._stop:
-                    if on_update:
-                        on_update("Execution stopped")
+                if not self._checkpoint() or (schedule and not schedule.wait(self._wait)):
+                    self._emit(Message("Execution stopped"))
                     if on_finished:
                         on_finished(False, "stopped")
                     return
 
-                if on_update:
-                    on_update(f"Starting iteration {iteration}")
+                # re-resolve class settings when templates or class.yaml changed
+                if iteration > 1 and self._templates.refresh():
+                    plan = self.compile(workflow, dry_run)
 
-                for idx, step in enumerate(steps, start=1):
-                    if self._stop:
-                        if on_update:
-                            on_update("Execution stopped")
+                self._emit(IterationStarted(iteration))
+                iteration_started = time.monotonic()
+
+                for k, step in enumerate(plan.steps):
+                    if step_interval and k:
+                        # steps at fixed offsets from the iteration's deadline, not after each other
+                        due = schedule.deadline + k * step_interval
+                        if wait_until(due, self._wait):
+                            step_lateness.append(max(0.0, time.monotonic() - due))
+                    if not self._checkpoint():
+                        self._emit(Message("Execution stopped"))
                         if on_finished:
                             on_finished(False, "stopped")
                         return
 
-                    stype = step.get("type")
-                    params = step.get("params", {})
-                    if on_update:
-                        on_update(f"Step {idx}/{len(steps)}: {stype} {params}")
+                    self._emit(StepStarted(iteration, step))
+                    step_started = time.monotonic()
+
+                    if prefetch and step.prefetch is not None:
+                        self._start_prefetch(step.prefetch, drv)
 
                     try:
-                        self._execute_step(stype, params, drv, dry_run)
+                        self.timings.begin()
+                        output = step.run(drv, dry_run)
+                        self.timings.end(step)
+                        if output is not None:
+                            self.step_outputs[step.index] = output
+                        self._emit(StepFinished(iteration, step.index, step.type, time.monotonic() - step_started, output))
                     except Exception as e:
+                        if self._stopping:
+                            # the step gave up because its wait was interrupted
+                            self._emit(Message("Execution stopped"))
+                            if on_finished:
+                                on_finished(False, "stopped")
+                            return
                         log.exception("Step failed")
-                        if on_update:
-                            on_update(f"Step failed: {e}")
+                        self._emit(Message(f"Step failed: {e}"))
                         if on_finished:
                             on_finished(False, str(e))
                         return
 
                     # apply global inter-step delay (unless stop requested)
-                    if self._stop:
+                    if self._stopping:
                         break
+                    if step_interval:
+                        continue
                     try:
                         if delay_mode == 'random':
                             import random
@@ -98,15 +325,22 @@ class WorkflowExecutor:
                         if d > 0:
                             if dry_run:
                                 log.info(f"[dry] Inter-step delay {d}s")
-                                time.sleep(min(d, 0.1))
+                                self._wait(min(d, 0.1))
                             else:
-                                time.sleep(d)
+                                self._wait(d)
                     except Exception:
                         pass
 
+                if self._stopping:
+                    self._emit(Message("Execution stopped"))
+                    if on_finished:
+                        on_finished(False, "stopped")
+                    return
+
                 # completed one iteration
-                if on_update:
-                    on_update(f"Completed iteration {iteration}")
+                self._emit(IterationDone(iteration, time.monotonic() - iteration_started))
+                if schedule:
+                    log.debug("Iteration %d started %.1f ms late", iteration, schedule.lateness[-1] * 1000)
 
                 if not loop:
                     break
@@ -115,8 +349,26 @@ class WorkflowExecutor:
                 if iteration >= loop_count:
                     break
 
-            if on_update:
-                on_update("Workflow completed")
+            if schedule:
+                self.schedule_stats = schedule.stats()
+                if step_lateness:
+                    self.schedule_stats["step_max_ms"] = 1000 * max(step_lateness)
+            roi = self.roi.stats()["total"]
+            self._emit(Message(f"ROI cache: {roi['hits']} hits, {roi['misses']} misses"))
+            if schedule:
+                st = self.schedule_stats
+                self._emit(Message(f"Schedule: {st['ticks']} iterations, {st['skipped']} skipped, lateness "
+                                   f"p50 {st['p50_ms']:.1f} ms, p95 {st['p95_ms']:.1f} ms, max {st['max_ms']:.1f} ms"))
+            if self.find_times:
+                found = ", ".join(f"step {i} {1000 * sum(t) / len(t):.0f} ms"
+                                  for i, t in sorted(self.find_times.items()))
+                self._emit(Message(f"Time to found (mean): {found}"))
+            if self.prefetch_stats["used"] or self.prefetch_stats["stale"]:
+                self._emit(Message(f"Prefetch: {self.prefetch_stats['used']} used, {self.prefetch_stats['stale']} stale"))
+            timings = self.timings.summary()
+            if timings:
+                self._emit(Message("Step timings, p50/p95/p99 ms:\n" + "\n".join(timings)))
+            self._emit(Message("Workflow completed"))
             if on_finished:
                 on_finished(True, "completed")
 
@@ -124,91 +376,414 @@ class WorkflowExecutor:
             log.exception("Executor error")
             if on_finished:
                 on_finished(False, str(e))
+        finally:
+            self._prefetch = None
+            self._stop_capture()
+            self.timings.close()
 
     def _execute_step(self, stype: str, params: dict, driver, dry_run: bool):
-        st = stype.lower()
-        if st in ("delay",):
-            seconds = float(params.get("seconds", 1.0))
-            if dry_run:
-                log.info(f"[dry] Delay {seconds}s")
-                time.sleep(min(seconds, 0.1))
-            else:
-                time.sleep(seconds)
+        """Compile and run a single step outside a plan."""
+        return compile_step(1, {"type": stype, "params": params}, self, dry_run).run(driver, dry_run)
 
-        elif st in ("typetext", "type_text"):
-            text = params.get("text", "")
-            if dry_run:
-                log.info(f"[dry] TypeText: {text}")
-            else:
-                if driver:
-                    driver.type_text(text)
-                elif pyautogui:
-                    pyautogui.typewrite(text)
-
-        elif st in ("keypress", "key_press"):
-            key = params.get("key", "")
-            if dry_run:
-                log.info(f"[dry] KeyPress: {key}")
-            else:
-                if driver:
-                    driver.press_key(key)
-                elif pyautogui:
-                    pyautogui.press(key)
-
-        elif st in ("findandclick", "find_and_click", "findclick"):
-            class_name = params.get("class") or params.get("class_name")
-            retries = int(params.get("retries", 3))
-            if dry_run:
-                log.info(f"[dry] FindAndClick class={class_name} retries={retries}")
-                time.sleep(0.1)
-                return
+    # --- step handlers, bound to compiled steps by engine.plan ----------------
+
+    def _do_delay(self, step: Step, driver, dry_run: bool):
+        if dry_run:
+            log.info(f"[dry] Delay {step.seconds}s")
+            self._wait(min(step.seconds, 0.1))
+        else:
+            self._wait(step.seconds)
+
+    def _do_type_text(self, step: Step, driver, dry_run: bool):
+        if dry_run:
+            log.info(f"[dry] TypeText: {step.text}")
+            return
+        if not self._checkpoint():
+            return
+        if self.no_input:
+            log.info(f"[no input] TypeText: {step.text}")
+            return
+        started = time.perf_counter_ns()
+        if driver:
+            driver.type_text(step.text)
+        elif _pyautogui():
+            _pyautogui().typewrite(step.text)
+        self.timings.since("input", started)
+        self._last_input = time.monotonic()
+
+    def _do_key_press(self, step: Step, driver, dry_run: bool):
+        if dry_run:
+            log.info(f"[dry] KeyPress: {step.key}")
+            return
+        if not self._checkpoint():
+            return
+        if self.no_input:
+            log.info(f"[no input] KeyPress: {step.key}")
+            return
+        started = time.perf_counter_ns()
+        if driver:
+            driver.press_key(step.key)
+        elif _pyautogui():
+            _pyautogui().press(step.key)
+        self.timings.since("input", started)
+        self._last_input = time.monotonic()
+
+    def _do_find(self, step: FindStep, driver, dry_run: bool):
+        if dry_run:
+            log.info(f"[dry] {step.type} classes={list(step.classes)} timeout={self._step_timeout(step)}s")
+            self._wait(0.1)
+            return
+
+        winner, match = self._find_step(step, driver)
+        if not match:
+            if step.any:
+                raise RuntimeError(f"None of the classes {list(step.classes)} found on screen")
+            raise RuntimeError(f"Template for class '{step.classes[0]}' not found on screen")
 
-            # attempt to locate template image in project classes
-            found = False
-            # attempt to locate image inside configured projects dir: <project>/classes/<class_name>/*.png
+        x, y = match.center
+        log.info(f"{step.type} class={winner} template={match.template.path.name} at ({x}, {y}) score={match.score:.3f}")
+        # a pause requested during the search holds the click until resumed
+        if step.click and self.no_input:
+            log.info(f"[no input] Click at ({x}, {y})")
+        elif step.click and self._checkpoint():
+            started = time.perf_counter_ns()
+            if driver:
+                driver.click(x, y)
+            elif _pyautogui():
+                _pyautogui().click(x, y)
+            self.timings.since("input", started)
+            self._last_input = time.monotonic()
+        if step.any:
+            return {"class": winner, "x": x, "y": y, "score": round(match.score, 4)}
+
+    def _do_unknown(self, step: Step, driver, dry_run: bool):
+        log.info(f"[dry] Unknown step {step.type}")
+
+    def _project_dir(self, workflow, options: dict) -> Optional[pathlib.Path]:
+        """The project a run belongs to: option 'project_dir', else the one named like the workflow."""
+        if options.get('project_dir'):
+            return pathlib.Path(options['project_dir'])
+        name = getattr(workflow, "name", None)
+        if name:
+            path = self._projects_root() / name
+            if path.is_dir():
+                return path
+        return None
+
+    def _projects_root(self) -> pathlib.Path:
+        # templates live inside the configured projects dir: <project>/classes/<class_name>/*.png
+        if self.projects_dir is not None:
+            return pathlib.Path(self.projects_dir)
+        try:
+            from app.config import get_projects_dir
+            return get_projects_dir()
+        except Exception:
+            return pathlib.Path.cwd() / "projects"
+
+    def _find_step(self, step: FindStep, driver) -> Tuple[Optional[str], Optional["Match"]]:
+        """Locate a find step's target, using its prefetched match when still on screen."""
+        started = time.monotonic()
+        hint = self._take_prefetch(step)
+        if hint is not None:
+            name, match = hint
+            match = self._revalidate(step, name, match, driver)
+            if match:
+                self.prefetch_stats["used"] += 1
+                self._matches[name] = match
+                elapsed = time.monotonic() - started
+                self.find_times.setdefault(step.index, []).append(elapsed)
+                self._emit(MatchResult(step.index, name, match, elapsed))
+                return name, match
+            self.prefetch_stats["stale"] += 1
+        name, match = self._search(step.candidates, self._step_timeout(step), driver, self._search_region(step, driver))
+        elapsed = time.monotonic() - started
+        if match:
+            self.find_times.setdefault(step.index, []).append(elapsed)
+            log.info("Step %d found %s in %.0f ms", step.index, name, elapsed * 1000)
+        self._emit(MatchResult(step.index, name, match, elapsed))
+        return name, match
+
+    def _step_timeout(self, step: FindStep) -> float:
+        """Seconds a find step keeps polling: its own timeout, else the default, else its retries."""
+        if step.timeout is not None:
+            return step.timeout
+        if self.default_timeout is not None:
+            return self.default_timeout
+        # what `retries` attempts 0.5 s apart used to take
+        return max(0, step.retries - 1) * 0.5
+
+    def _configured_timeout(self, options: dict) -> Optional[float]:
+        value = options.get('timeout')
+        if value in (None, ""):
             try:
-                from app.config import get_projects_dir
-                projects_root = get_projects_dir()
+                from app.config import load_config
+                value = load_config().get('timeout')
             except Exception:
-                projects_root = pathlib.Path.cwd() / "projects"
+                value = None
+        try:
+            return max(0.0, float(value)) if value not in (None, "") else None
+        except (TypeError, ValueError):
+            log.warning("Ignoring invalid default timeout %r", value)
+            return None
 
-            if projects_root.exists():
-                for proj in projects_root.iterdir():
-                    if not proj.is_dir():
-                        continue
-                    template = proj / "classes" / class_name
-                    if template.exists():
-                        imgs = list(template.glob("*.png"))
-                        if not imgs:
-                            continue
-                        tpl = str(imgs[0])
-                        for attempt in range(retries):
-                            if pyautogui and hasattr(pyautogui, 'locateCenterOnScreen'):
-                                try:
-                                    loc = pyautogui.locateCenterOnScreen(tpl, confidence=0.8)
-                                except Exception:
-                                    loc = None
-                            else:
-                                loc = None
-                            if loc:
-                                x, y = loc.x, loc.y
-                                if driver:
-                                    driver.click(x, y)
-                                elif pyautogui:
-                                    pyautogui.click(x, y)
-                                found = True
-                                break
-                            time.sleep(0.5)
-                        break
+    def _start_prefetch(self, step: FindStep, driver):
+        """Search for `step`'s target in the background."""
+        def search():
+            return self._search(step.candidates, 0, driver, self._search_region(step, driver), count_roi=False)
 
-            if not found:
-                raise RuntimeError(f"Template for class '{class_name}' not found on screen")
+        if self._prefetcher is None:
+            # a separate single worker: the match pool may be busy with (or be) this search's fan-out
+            self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autoai-prefetch")
+        self._prefetch = (step, self._prefetcher.submit(search))
 
-        else:
-            # Unknown step: ignore in dry-run, error in live
-            if dry_run:
-                log.info(f"[dry] Unknown step {stype}")
+    def _take_prefetch(self, step: FindStep) -> Optional[Tuple[str, "Match"]]:
+        pending, self._prefetch = self._prefetch, None
+        if pending is None or pending[0] is not step:
+            return None
+        started = time.perf_counter_ns()
+        try:
+            # usually done by now; otherwise finishing it beats starting over
+            name, match = pending[1].result()
+        except Exception:
+            log.debug("Prefetch failed", exc_info=True)
+            return None
+        finally:
+            self.timings.since("match", started)
+        return (name, match) if match else None
+
+    def _revalidate(self, step: FindStep, name: str, match: "Match", driver) -> Optional["Match"]:
+        """Re-match the prefetched template in a fresh grab of its neighbourhood."""
+        _, matcher, threshold = next(c for c in step.candidates if c[0] == name)
+        x, y, w, h = match.box
+        mx, my = w // 4 + 2, h // 4 + 2
+        frame = self._capture(driver, (x - mx, y - my, w + 2 * mx, h + 2 * my))
+        started = time.perf_counter_ns()
+        fresh = matcher.matcher.match(frame, match.template, threshold)
+        self.timings.since("match", started)
+        if fresh:
+            fresh.template = match.template
+        return fresh
+
+    def _search_region(self, step: FindStep, driver) -> Optional[Box]:
+        """The step's search rectangle in screen coordinates, or None for the whole screen.
+
+        `region` is absolute unless `anchor` names a class, in which case it is
+        offset from the top-left corner of that class's match on screen.
+        """
+        if not step.anchor:
+            return step.region
+        box = self._anchor_box(step.anchor, driver)
+        if box is None:
+            raise RuntimeError(f"Anchor class '{step.anchor}' not found on screen")
+        x, y, w, h = step.region
+        return (box[0] + x, box[1] + y, w, h)
+
+    def _anchor_box(self, anchor: str, driver) -> Optional[Box]:
+        # the anchor may have moved; look around its last position before grabbing everything
+        last = self._matches.get(anchor)
+        if last is not None:
+            x, y, w, h = last.box
+            _, match = self._find([anchor], 1, driver, region=(x - w, y - h, 3 * w, 3 * h))
+            if match:
+                return match.box
+        _, match = self._find([anchor], 1, driver)
+        return match.box if match else None
+
+    def _find(self, classes: List[str], retries: int, driver, matcher_name: Optional[str] = None,
+              confidence=None, region: Optional[Box] = None) -> Tuple[Optional[str], Optional["Match"]]:
+        """Find the best of `classes` within what `retries` attempts 0.5 s apart would take."""
+        candidates = [(name,) + self._resolve(name, matcher_name, confidence) for name in classes]
+        return self._search(candidates, max(0, retries - 1) * 0.5, driver, region)
+
+    def _search(self, candidates, timeout: float, driver, region: Optional[Box] = None,
+                count_roi: bool = True) -> Tuple[Optional[str], Optional["Match"]]:
+        """Poll the screen for up to `timeout` seconds; return the best-scoring (class, match).
+
+        `candidates` are (class, ClassMatcher, threshold) tuples. With a
+        `region` only that rectangle of the screen is grabbed and searched.
+        Without `count_roi` (speculative searches) ROI hits and misses are
+        not counted.
+        There is always at least one attempt. Attempts follow the `poll`
+        backoff (fast at first); with background capture running they
+        follow new frames instead.
+
+        After a miss only the screen regions that changed since the previous
+        attempt are searched again: windows over unchanged pixels keep the
+        score that already missed, so a static screen costs just the diff.
+        """
+        index = self._template_index()
+        candidates = [(name, index.get(name), matcher, threshold) for name, matcher, threshold in candidates]
+        candidates = [c for c in candidates if c[1]]
+        if not candidates:
+            return None, None
+        from .capture import FrameDiffer
+        differ = FrameDiffer()
+        deadline = time.monotonic() + timeout
+        intervals = backoff(*self.poll)
+        frame = None
+        while True:
+            if frame is not None:
+                self.search_retries += 1
+            # with background capture, wait for a frame newer than the one that missed
+            frame = self._capture(driver, region, after=frame.timestamp if frame is not None else None)
+            started = time.perf_counter_ns()
+            found = []
+            dirty = differ.update(frame)
+            if dirty is not None and not dirty:
+                log.debug("Screen unchanged since last miss; skipping match")
             else:
-                raise RuntimeError(f"Unknown step type: {stype}")
+                if len(candidates) == 1:
+                    name, tpls, matcher, threshold = candidates[0]
+                    results = [(name, self._locate(frame, name, tpls, matcher, threshold, dirty, count_roi))]
+                else:
+                    pool = self._worker_pool()
+                    futures = [(name, pool.submit(self._locate, frame, name, tpls, matcher, threshold, dirty,
+                                                  count_roi))
+                               for name, tpls, matcher, threshold in candidates]
+                    results = [(name, fut.result()) for name, fut in futures]
+                found = [(name, m) for name, m in results if m]
+            self.timings.since("match", started)
+            if found:
+                name, match = max(found, key=lambda r: r[1].score)
+                self._matches[name] = match
+                return name, match
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            service = self._capture_service
+            delay = 0.0 if service is not None and service.running else min(next(intervals), remaining)
+            waited = time.monotonic()
+            if not self._wait(delay):
+                break
+            # _wait returns after `delay` unpaused seconds; the rest was paused and does not count
+            deadline += max(0.0, time.monotonic() - waited - delay)
+        return None, None
+
+    def _resolve(self, class_name: str, matcher_name: Optional[str], confidence) -> Tuple["ClassMatcher", float]:
+        """Backend and threshold for a class: step params, else class.yaml, else defaults."""
+        settings = self._template_index().settings(class_name)
+        matcher = self._class_matcher(matcher_name or settings.get("matcher") or self.matcher_name)
+        threshold = float(confidence if confidence is not None else settings.get("confidence", 0.8))
+        return matcher, threshold
+
+    def _worker_pool(self) -> ThreadPoolExecutor:
+        # NumPy releases the GIL in the heavy kernels, so threads overlap well
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="autoai-match")
+        return self._pool
+
+    def _locate(self, frame: "Frame", class_name: str, templates, matcher: "ClassMatcher", threshold: float,
+                dirty: Optional[List[Tuple[int, int, int, int]]] = None, count_roi: bool = True) -> Optional["Match"]:
+        """Search the class's last-hit regions first, then the whole frame.
+
+        When `dirty` rectangles are given (a retry after a miss) only windows
+        overlapping them are searched; such searches, and those without
+        `count_roi`, update the class's last location but not the ROI counters.
+        """
+        ox, oy = frame.origin
+        tw, th = max(t.width for t in templates), max(t.height for t in templates)
+        if dirty is not None:
+            regions = [(x - tw + 1, y - th + 1, w + 2 * tw - 2, h + 2 * th - 2) for x, y, w, h in dirty]
+            fh, fw = frame.shape
+            # past half the frame a single full search is cheaper than many crops
+            if sum(w * h for _, _, w, h in regions) < fh * fw // 2:
+                for x, y, w, h in regions:
+                    match = matcher.match(frame.crop(x - ox, y - oy, w, h), templates, threshold)
+                    if match:
+                        self.roi.record(class_name, match.box, in_roi=None)
+                        return match
+                return None
+
+        for x, y, w, h in self.roi.regions(class_name, (tw, th)):
+            match = matcher.match(frame.crop(x - ox, y - oy, w, h), templates, threshold)
+            if match:
+                self.roi.record(class_name, match.box, in_roi=True if count_roi else None)
+                return match
+        match = matcher.match(frame, templates, threshold)
+        self.roi.record(class_name, match.box if match else None, in_roi=False if count_roi else None)
+        return match
+
+    def _class_matcher(self, name: Optional[str]) -> "ClassMatcher":
+        # one per backend so template hit rates persist across steps and runs
+        key = (name or "").lower()
+        cm = self._class_matchers.get(key)
+        if cm is None:
+            from .matching import ClassMatcher, get_matcher
+            cm = self._class_matchers[key] = ClassMatcher(get_matcher(name))
+        return cm
+
+    def _grabber(self, driver) -> Callable[..., object]:
+        """The capture callable: the explicit source, else the driver, else any live source."""
+        if self.source is None and not driver:
+            from .sources import get_source
+            self.source = get_source()
+        if self.source is not None:
+            return self.source.grab
+        if driver:
+            return driver.screenshot
+        raise RuntimeError("No screen capture backend available")
+
+    def _start_capture(self, driver, fps: float):
+        try:
+            grab = self._grabber(driver)
+        except RuntimeError:
+            return
+        from .capture import CaptureService
+        self._capture_service = CaptureService(grab, fps=fps).start()
+        log.info("Background capture at %.1f fps", fps)
+
+    def _stop_capture(self):
+        service, self._capture_service = self._capture_service, None
+        if service is not None:
+            service.stop()
+            log.info("Background capture stats: %s", service.stats())
+            for key in self.capture_totals:
+                self.capture_totals[key] += getattr(service, key)
+
+    def _capture(self, driver, region: Optional[Box] = None, after: Optional[float] = None) -> "Frame":
+        """Grab the screen, or only `region` (x, y, w, h) of it.
+
+        With background capture running the frame is the newest one grabbed
+        after the last input and after monotonic time `after`, if given.
+        """
+        started = time.perf_counter_ns()
+        try:
+            return self._grab_frame(driver, region, after)
+        finally:
+            self.timings.since("capture", started)
+
+    def _grab_frame(self, driver, region: Optional[Box], after: Optional[float]) -> "Frame":
+        if region is not None:
+            x, y, w, h = region
+            # clip to the screen's top-left; backends reject negative origins (and clip the far edges)
+            region = (max(0, x), max(0, y), w + min(0, x), h + min(0, y))
+            if region[2] <= 0 or region[3] <= 0:
+                raise ValueError(f"Search region {(x, y, w, h)} lies off screen")
+        service = self._capture_service
+        if service is not None and service.running:
+            # the grab must postdate our last input, or the screen may not reflect it yet
+            newer_than = self._last_input if after is None else max(self._last_input, after)
+            frame = service.next_frame(after=newer_than, timeout=max(1.0, 3.0 / service.fps))
+            if frame is not None:
+                if region is None:
+                    return frame
+                x, y, w, h = region
+                ox, oy = frame.origin
+                return frame.crop(x - ox, y - oy, w, h)
+            log.debug("Background capture stalled; grabbing synchronously")
+        started = time.monotonic()
+        pixels = self._grabber(driver)(region=region)
+        origin = region[:2] if region else (0, 0)
+        import numpy as np
+        from .matching import Frame
+        if isinstance(pixels, np.ndarray):
+            return Frame(rgb=pixels, origin=origin, timestamp=started)
+        return Frame(image=pixels, origin=origin, timestamp=started)
+
+    def _template_index(self) -> "TemplateIndex":
+        if self._templates is None:
+            from .templates import TemplateIndex
+            self._templates = TemplateIndex(self._projects_root()).build()
+        return self._templates
 
 #
@@ -0,0 +1,716 @@
+"""Template matching backends used by find steps.
+
+The default backend is a NumPy normalized cross-correlation (NCC) matcher
+that uses integral images for the per-window sums, so it needs neither
+OpenCV nor a fresh screenshot per template. The pyramid backend (the
+default) runs that matcher coarse-to-fine. `pyautogui` is kept as a
+fallback backend for hosts where it behaves better.
+"""
+import importlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+log = logging.getLogger("autoai.matching")
+
+# windows whose variance is below this are treated as flat (no structure)
+_FLAT_EPS = 1e-3
+
+
+class Match:
+    """A located template: top-left corner in screen coordinates, size and score."""
+
+    def __init__(self, x: int, y: int, width: int, height: int, score: float):
+        self.x = int(x)
+        self.y = int(y)
+        self.width = int(width)
+        self.height = int(height)
+        self.score = float(score)
+        # set by ClassMatcher to the template variant that produced the match
+        self.template = None
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return (self.x + self.width // 2, self.y + self.height // 2)
+
+    @property
+    def box(self) -> Tuple[int, int, int, int]:
+        return (self.x, self.y, self.width, self.height)
+
+    def __repr__(self):
+        return f"Match(x={self.x}, y={self.y}, w={self.width}, h={self.height}, score={self.score:.3f})"
+
+
+class Frame:
+    """A captured screen (or part of one) prepared for matching.
+
+    Holds a PIL image, an RGB array and/or a grayscale array and derives
+    the others on demand. Derived data (grayscale pixels, integral images)
+    is cached so several templates matched against one frame share the
+    preprocessing. `origin` is the screen position of the frame's top-left
+    pixel and `timestamp` the monotonic time the capture started, if known.
+    """
+
+    def __init__(self, image=None, gray: Optional[np.ndarray] = None, origin: Tuple[int, int] = (0, 0),
+                 rgb: Optional[np.ndarray] = None, timestamp: Optional[float] = None):
+        if image is None and gray is None and rgb is None:
+            raise ValueError("Frame needs an image or a pixel array")
+        self._image = image
+        self._rgb = rgb
+        self._gray = None if gray is None else np.asarray(gray, dtype=np.float32)
+        self.timestamp = timestamp
+        self._integrals = None
+        self._squared = None
+        self._levels: Dict[int, "Frame"] = {}
+        self._spectra: Dict[tuple, np.ndarray] = {}
+        self.origin = (int(origin[0]), int(origin[1]))
+        # frame a crop views into; keeps e.g. a capture ring slot pinned while the crop lives
+        self._parent: Optional["Frame"] = None
+        # (PIL image, box) a crop of a PIL-backed frame takes its colour pixels from, on demand
+        self._image_box: Optional[tuple] = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            if self._rgb is not None:
+                self._image = Image.fromarray(np.ascontiguousarray(self._rgb), mode="RGB")
+            elif self._image_box is not None:
+                image, box = self._image_box
+                self._image = image.crop(box)
+            else:
+                self._image = Image.fromarray(np.clip(self._gray, 0, 255).astype(np.uint8), mode="L")
+        return self._image
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            if self._rgb is not None:
+                self._gray = rgb_to_gray(self._rgb)
+            else:
+                self._gray = np.asarray(self._image.convert("L"), dtype=np.float32)
+        return self._gray
+
+    @property
+    def squared(self) -> np.ndarray:
+        """Squared grayscale pixels, used for masked window variances."""
+        if self._squared is None:
+            self._squared = self.gray * self.gray
+        return self._squared
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.gray.shape
+
+    def spectrum(self, source: str, size: Tuple[int, int], dtype=np.float32) -> np.ndarray:
+        """Real FFT of the `gray` or `squared` pixels zero-padded to `size`, cached."""
+        key = (source, size, np.dtype(dtype).str)
+        spec = self._spectra.get(key)
+        if spec is None:
+            pixels = self.gray if source == "gray" else self.squared
+            spec = self._spectra[key] = np.fft.rfft2(pixels.astype(dtype, copy=False), s=size)
+        return spec
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "Frame":
+        """Sub-frame sharing pixels with this one; coordinates are frame-local.
+
+        The crop keeps the colour pixels too, for backends that match on `image`.
+        """
+        fh, fw = self.shape
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = max(x0, min(fw, int(x + width))), max(y0, min(fh, int(y + height)))
+        ox, oy = self.origin
+        sub = Frame(gray=self.gray[y0:y1, x0:x1], origin=(ox + x0, oy + y0), timestamp=self.timestamp)
+        sub._parent = self
+        if self._rgb is not None:
+            sub._rgb = self._rgb[y0:y1, x0:x1]
+        elif self._image is not None:
+            sub._image_box = (self._image, (x0, y0, x1, y1))
+        elif self._image_box is not None:
+            image, (px, py, _, _) = self._image_box
+            sub._image_box = (image, (px + x0, py + y0, px + x1, py + y1))
+        return sub
+
+    def downscaled(self, factor: int) -> "Frame":
+        """Block-averaged copy at 1/`factor` resolution, cached per factor.
+
+        The returned frame uses its own (coarse) pixel coordinates.
+        """
+        if factor <= 1:
+            return self
+        level = self._levels.get(factor)
+        if level is None:
+            level = Frame(gray=downsample(self.gray, factor))
+            self._levels[factor] = level
+        return level
+
+    def integrals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-padded integral images of the pixels and of their squares."""
+        if self._integrals is None:
+            g = self.gray.astype(np.float64)
+            s = np.zeros((g.shape[0] + 1, g.shape[1] + 1), dtype=np.float64)
+            s2 = np.zeros_like(s)
+            np.cumsum(np.cumsum(g, axis=0), axis=1, out=s[1:, 1:])
+            np.cumsum(np.cumsum(g * g, axis=0), axis=1, out=s2[1:, 1:])
+            self._integrals = (s, s2)
+        return self._integrals
+
+
+# ITU-R 601 luma weights, as used by PIL's "L" conversion
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def rgb_to_gray(rgb: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Float32 luma of an (h, w, 3) array, optionally written into `out`."""
+    if out is None:
+        out = np.empty(rgb.shape[:2], dtype=np.float32)
+    np.multiply(rgb[..., 0], _LUMA[0], out=out)
+    out += rgb[..., 1] * _LUMA[1]
+    out += rgb[..., 2] * _LUMA[2]
+    return out
+
+
+def downsample(gray: np.ndarray, factor: int) -> np.ndarray:
+    """Anti-aliased 1/`factor` copy: means of overlapping 2f x 2f windows at stride f.
+
+    Plain block means make coarse scores depend on where the target sits
+    relative to the block grid; the overlap keeps off-grid matches scoring
+    high. Trailing partial blocks are dropped.
+    """
+    h, w = gray.shape[0] // factor, gray.shape[1] // factor
+    blocks = gray[:h * factor, :w * factor].reshape(h, factor, w, factor).mean(axis=(1, 3), dtype=np.float32)
+    if h < 2 or w < 2:
+        return blocks
+    return (blocks[:-1, :-1] + blocks[1:, :-1] + blocks[:-1, 1:] + blocks[1:, 1:]) * 0.25
+
+
+def window_sums(integral: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Sum of every `height` x `width` window, read from an integral image."""
+    return (integral[height:, width:] - integral[:-height, width:]
+            - integral[height:, :-width] + integral[:-height, :-width])
+
+
+def correlate(gray: np.ndarray, kernel: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """Valid-mode cross-correlation of `gray` with `kernel`.
+
+    Runs one vectorized pass per kernel row over a strided window view,
+    so no window copies of the screen are materialized. Zero rows are
+    skipped and each row only spans its non-zero columns, so masked-out
+    template pixels cost nothing.
+    """
+    th, tw = kernel.shape
+    oh, ow = gray.shape[0] - th + 1, gray.shape[1] - tw + 1
+    out = np.zeros((oh, ow), dtype=dtype)
+    for r in range(th):
+        nz = np.flatnonzero(kernel[r])
+        if nz.size == 0:
+            continue
+        c0, c1 = int(nz[0]), int(nz[-1]) + 1
+        rows = sliding_window_view(gray[r:r + oh, c0:c0 + ow + (c1 - c0) - 1], c1 - c0, axis=1)
+        out += np.einsum("ijk,k->ij", rows, kernel[r, c0:c1])
+    return out
+
+
+def fast_len(n: int) -> int:
+    """Smallest 2^a * 3^b * 5^c >= n, a size the FFT handles efficiently."""
+    best = 1 << max(0, (n - 1).bit_length())
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # smallest power of two lifting p35 to at least n
+            p = p35 << max(0, (-(-n // p35) - 1).bit_length())
+            best = min(best, p)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+# measured costs: spatial correlation per multiply-add, FFT per P*log2(P)
+_SPATIAL_NS = 0.22
+_FFT_NS = 1.2
+_SPECTRA_PER_TEMPLATE = 16
+
+
+def _span_cost(kernel: np.ndarray) -> int:
+    """Pixels `correlate` touches for `kernel`: the non-zero span of each row."""
+    cost = 0
+    for row in kernel:
+        nz = np.flatnonzero(row)
+        if nz.size:
+            cost += int(nz[-1] - nz[0]) + 1
+    return cost
+
+
+class Matcher(ABC):
+    """Locates a template inside a frame."""
+
+    name = ""
+
+    @abstractmethod
+    def match(self, frame: Frame, template, threshold: float = 0.8) -> Optional[Match]:
+        """Return the best match scoring at least `threshold`, or None."""
+        raise NotImplementedError
+
+
+class NCCMatcher(Matcher):
+    """Vectorized normalized cross-correlation on grayscale NumPy arrays."""
+
+    name = "ncc"
+
+    def __init__(self, fft: Optional[bool] = None):
+        # None picks the spatial or FFT path per correlation by estimated cost
+        self.fft = fft
+
+    def use_fft(self, frame_shape: Tuple[int, int], kernel: np.ndarray) -> bool:
+        if self.fft is not None:
+            return self.fft
+        th, tw = kernel.shape
+        oh, ow = frame_shape[0] - th + 1, frame_shape[1] - tw + 1
+        size = fast_len(frame_shape[0]) * fast_len(frame_shape[1])
+        return oh * ow * _span_cost(kernel) * _SPATIAL_NS > size * np.log2(size) * _FFT_NS
+
+    def _correlate(self, frame: Frame, source: str, kernel: np.ndarray, template, kind: str, dtype=np.float32) -> np.ndarray:
+        """Valid-mode correlation of a frame plane with `kernel`, spatial or via FFT.
+
+        On the FFT path the frame spectrum is cached on the frame (shared by
+        every template) and the kernel spectrum on the template, keyed by
+        `kind` and padded size, so retries on same-size frames reuse it.
+        """
+        if not self.use_fft(frame.shape, kernel):
+            pixels = frame.gray if source == "gray" else frame.squared
+            return correlate(pixels, kernel, dtype)
+
+        fh, fw = frame.shape
+        th, tw = kernel.shape
+        size = (fast_len(fh), fast_len(fw))
+        cache = getattr(template, "spectra", None)
+        key = (kind, size, np.dtype(dtype).str)
+        kspec = cache.get(key) if cache is not None else None
+        if kspec is None:
+            kspec = np.conj(np.fft.rfft2(kernel.astype(dtype, copy=False), s=size))
+            if cache is not None:
+                # crops come in many sizes; keep only the most recent spectra
+                while len(cache) >= _SPECTRA_PER_TEMPLATE:
+                    cache.pop(next(iter(cache)))
+                cache[key] = kspec
+        # circular correlation equals the valid one since size >= frame size
+        out = np.fft.irfft2(frame.spectrum(source, size, dtype) * kspec, s=size)
+        return out[:fh - th + 1, :fw - tw + 1].astype(dtype, copy=False)
+
+    def scores(self, frame: Frame, template) -> np.ndarray:
+        """NCC score map in [-1, 1]; entry (y, x) scores the window at (x, y)."""
+        tpl = template.pixels
+        th, tw = tpl.shape
+        fh, fw = frame.shape
+        if th > fh or tw > fw:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if getattr(template, "mask", None) is not None:
+            return self._masked_scores(frame, template)
+
+        n = float(th * tw)
+        s, s2 = frame.integrals()
+        sums = window_sums(s, th, tw)
+        win_var = window_sums(s2, th, tw) - sums * sums / n
+        tpl_zero = tpl - tpl.mean()
+        tpl_var = float((tpl_zero * tpl_zero).sum())
+
+        # sum(I * (T - mean T)) is the numerator since the template term is zero-mean
+        num = None if tpl_var < _FLAT_EPS else self._correlate(frame, "gray", tpl_zero, template, "zero")
+        return _normalise(n, sums, win_var, float(tpl.mean()), tpl_var, num)
+
+    def _masked_scores(self, frame: Frame, template) -> np.ndarray:
+        """NCC over the template's visible pixels only.
+
+        Window sums cannot come from integral images under an arbitrary
+        mask, so they are correlations with the mask itself.
+        """
+        mask = template.mask
+        n = float(mask.sum())
+        oh, ow = frame.shape[0] - template.height + 1, frame.shape[1] - template.width + 1
+        if n == 0:
+            return np.zeros((oh, ow), dtype=np.float32)
+
+        tpl_mean = float((template.pixels * mask).sum()) / n
+        tpl_zero = (template.pixels - tpl_mean) * mask
+        tpl_var = float((tpl_zero * tpl_zero).sum())
+        sums, sq_sums = self._masked_window_sums(frame, template)
+        win_var = sq_sums - sums * sums / n
+
+        num = None if tpl_var < _FLAT_EPS else self._correlate(frame, "gray", tpl_zero, template, "masked_zero")
+        return _normalise(n, sums, win_var, tpl_mean, tpl_var, num)
+
+    def _masked_window_sums(self, frame: Frame, template):
+        """Per-window sums of pixels and squared pixels under the template mask.
+
+        Mostly-visible masks are cheaper as the full-window sum (from the
+        integral images) minus the masked-out part, so correlate whichever
+        of the mask and its complement spans fewer pixels. Accumulation is
+        float64 since the results feed a variance.
+        """
+        mask = template.mask
+        th, tw = mask.shape
+        inverse = 1.0 - mask
+        if _span_cost(inverse) < _span_cost(mask):
+            s, s2 = frame.integrals()
+            sums = window_sums(s, th, tw) - self._correlate(frame, "gray", inverse, template, "inverse", np.float64)
+            sq_sums = window_sums(s2, th, tw) - self._correlate(frame, "squared", inverse, template, "inverse", np.float64)
+        else:
+            sums = self._correlate(frame, "gray", mask, template, "mask", np.float64)
+            sq_sums = self._correlate(frame, "squared", mask, template, "mask", np.float64)
+        return sums, sq_sums
+
+    def match(self, frame: Frame, template, threshold: float = 0.8) -> Optional[Match]:
+        scores = self.scores(frame, template)
+        if scores.size == 0:
+            return None
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        score = float(scores[y, x])
+        if score < threshold:
+            return None
+        ox, oy = frame.origin
+        return Match(ox + x, oy + y, template.width, template.height, score)
+
+
+def _normalise(n: float, sums: np.ndarray, win_var: np.ndarray, tpl_mean: float, tpl_var: float,
+               num: Optional[np.ndarray]) -> np.ndarray:
+    """NCC score map from window sums/variances over `n` pixels and the correlation `num`.
+
+    `num` is None for a flat template (`tpl_var` below _FLAT_EPS).
+    """
+    if tpl_var < _FLAT_EPS:
+        # a flat template has no NCC; score flat windows by mean difference
+        flat = win_var < _FLAT_EPS * n
+        diff = np.abs(sums / n - tpl_mean) / 255.0
+        return np.where(flat, 1.0 - diff, 0.0).astype(np.float32)
+    # flat windows have no NCC; the variance test also absorbs rounding noise
+    denom = np.sqrt(np.maximum(win_var, 0.0) * tpl_var)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(win_var > _FLAT_EPS * n, num / denom, 0.0)
+    return out.astype(np.float32)
+
+
+def top_peaks(scores: np.ndarray, k: int, min_score: float, radius: Tuple[int, int]):
+    """Up to `k` (score, x, y) local maxima, suppressing neighbours within `radius`."""
+    scores = scores.copy()
+    ry, rx = radius
+    peaks = []
+    for _ in range(k):
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        score = float(scores[y, x])
+        if score < min_score:
+            break
+        peaks.append((score, int(x), int(y)))
+        scores[max(0, y - ry):y + ry + 1, max(0, x - rx):x + rx + 1] = -np.inf
+    return peaks
+
+
+class PyramidMatcher(NCCMatcher):
+    """Coarse-to-fine NCC: find candidates on a downscaled frame, refine at full size.
+
+    The downscale factor adapts to the template so its coarse copy keeps at
+    least `min_side` pixels per side; templates too small for any pyramid
+    level are matched at full resolution. Only the `top_k` coarse peaks
+    scoring within `coarse_slack` of the threshold are refined.
+    """
+
+    name = "pyramid"
+
+    def __init__(self, factors=(8, 4, 2), min_side: int = 6, top_k: int = 5, coarse_slack: float = 0.3,
+                 fft: Optional[bool] = None):
+        super().__init__(fft)
+        self.factors = tuple(sorted(factors, reverse=True))
+        self.min_side = min_side
+        self.top_k = top_k
+        self.coarse_slack = coarse_slack
+
+    def factor_for(self, template, frame: Frame) -> int:
+        side = min(template.height, template.width)
+        fh, fw = frame.shape
+        for f in self.factors:
+            # the coarse search must be a real saving, not a handful of windows
+            if side // f - 1 >= self.min_side and min(fh, fw) // f >= 4 * self.min_side:
+                return f
+        return 1
+
+    def match(self, frame: Frame, template, threshold: float = 0.8) -> Optional[Match]:
+        f = self.factor_for(template, frame)
+        if f == 1:
+            return super().match(frame, template, threshold)
+
+        coarse_tpl = template.downscaled(f)
+        coarse = self.scores(frame.downscaled(f), coarse_tpl)
+        if coarse.size == 0:
+            return None
+        radius = (max(1, coarse_tpl.height // 2), max(1, coarse_tpl.width // 2))
+        peaks = top_peaks(coarse, self.top_k, threshold - self.coarse_slack, radius)
+
+        best = None
+        for _, cx, cy in peaks:
+            # a coarse pixel covers f full-res positions; search one block around it
+            region = frame.crop(cx * f - f, cy * f - f, template.width + 2 * f, template.height + 2 * f)
+            m = super().match(region, template, threshold)
+            if m and (best is None or m.score > best.score):
+                best = m
+        return best
+
+
+class SSDMatcher(Matcher):
+    """Sum-of-squared-differences matcher for pixel-exact UI bitmaps.
+
+    Candidate windows are first filtered on a few high-contrast anchor
+    pixels that must lie close to the template's, as they do for exact
+    bitmaps: within a few times the RMS difference the threshold allows,
+    a quarter of the template's contrast and at most `anchor_tolerance`
+    grey levels. The first `dense_anchors` are tested at every position,
+    the rest only at the positions still left. When the frame already has
+    integral images the survivors' window means are checked too (never
+    built just for this). Survivors accumulate SSD row by row in chunks
+    of `chunk`, most varied rows first, dropping every window whose partial
+    sum already exceeds what the threshold (or the best window so far)
+    allows. When more than `max_candidates` survive (low-contrast screens),
+    SSD is computed for all windows at once as sum(I^2) - 2 sum(IT) +
+    sum(T^2) from integral images and one correlation. Scores are
+    1 - RMS difference / 255 over visible pixels.
+    """
+
+    name = "ssd"
+
+    def __init__(self, anchors: int = 8, anchor_tolerance: float = 24.0, dense_anchors: int = 3,
+                 max_candidates: int = 20000, chunk: int = 4096):
+        self.anchors = anchors
+        self.anchor_tolerance = anchor_tolerance
+        # anchors tested with whole-frame slices before switching to the survivors' coordinates
+        self.dense_anchors = dense_anchors
+        # more survivors than this are scored by correlation instead of row by row
+        self.max_candidates = max_candidates
+        # survivors gathered per pass of the row loop, bounding its memory
+        self.chunk = chunk
+
+    def _anchor_pixels(self, template):
+        pixels = template.pixels
+        mask = getattr(template, "mask", None)
+        dev = np.abs(pixels - pixels.mean())
+        if mask is not None:
+            dev = np.where(mask > 0, dev, -1.0)
+        k = min(self.anchors, dev.size)
+        flat = np.argpartition(dev.ravel(), -k)[-k:]
+        ys, xs = np.unravel_index(flat, pixels.shape)
+        keep = dev[ys, xs] >= 0
+        return ys[keep], xs[keep]
+
+    def match(self, frame: Frame, template, threshold: float = 0.95) -> Optional[Match]:
+        tpl = template.pixels
+        th, tw = tpl.shape
+        fh, fw = frame.shape
+        if th > fh or tw > fw:
+            return None
+        mask = getattr(template, "mask", None)
+        n = float(th * tw) if mask is None else float(mask.sum())
+        if n == 0:
+            return None
+        gray = frame.gray
+        oh, ow = fh - th + 1, fw - tw + 1
+        # largest total SSD that still scores at least `threshold`
+        budget = n * ((1.0 - threshold) * 255.0) ** 2
+        visible = tpl if mask is None else tpl[mask > 0]
+        contrast = float(visible.max() - visible.min())
+        # a fixed tolerance passes nearly everything on low-contrast screens
+        per_pixel = max(1.0, min(self.anchor_tolerance, float(np.sqrt(budget)),
+                                 2.0 * float(np.sqrt(budget / n)), 0.25 * contrast))
+
+        # signature 1: no single anchor pixel may use up its share of the budget
+        anchors = list(zip(*self._anchor_pixels(template)))
+        if anchors:
+            ok = np.ones((oh, ow), dtype=bool)
+            for ay, ax in anchors[:self.dense_anchors]:
+                ok &= np.abs(gray[ay:ay + oh, ax:ax + ow] - tpl[ay, ax]) <= per_pixel
+            ys, xs = np.nonzero(ok)
+            for ay, ax in anchors[self.dense_anchors:]:
+                keep = np.abs(gray[ys + ay, xs + ax] - tpl[ay, ax]) <= per_pixel
+                ys, xs = ys[keep], xs[keep]
+        else:
+            ys, xs = np.nonzero(np.ones((oh, ow), dtype=bool))
+        # signature 2: the window mean can differ by at most the RMS difference
+        if mask is None and frame._integrals is not None and ys.size:
+            s = frame._integrals[0]
+            sums = s[ys + th, xs + tw] - s[ys, xs + tw] - s[ys + th, xs] + s[ys, xs]
+            keep = np.abs(sums / n - float(tpl.mean())) <= float(np.sqrt(budget / n)) + 1e-3
+            ys, xs = ys[keep], xs[keep]
+
+        if ys.size == 0:
+            return None
+        if ys.size > self.max_candidates:
+            ssd = self._ssd_map(frame, template)[ys, xs]
+            keep = ssd <= budget
+            ys, xs, ssd = ys[keep], xs[keep], ssd[keep]
+        else:
+            ys, xs, ssd = self._ssd_rows(gray, template, ys, xs, budget)
+        if ys.size == 0:
+            return None
+        best = int(np.argmin(ssd))
+        score = 1.0 - float(np.sqrt(max(0.0, float(ssd[best])) / n)) / 255.0
+        ox, oy = frame.origin
+        return Match(ox + int(xs[best]), oy + int(ys[best]), tw, th, score)
+
+    def _ssd_rows(self, gray: np.ndarray, template, ys: np.ndarray, xs: np.ndarray, budget: float):
+        """(ys, xs, ssd) of the windows at `ys`, `xs` whose SSD is within `budget`.
+
+        Each chunk's best SSD tightens the budget for the next, since only
+        the minimum is wanted.
+        """
+        tpl = template.pixels
+        mask = getattr(template, "mask", None)
+        cols = np.arange(tpl.shape[1])
+        # rows with the most structure reject mismatches soonest
+        order = np.argsort(-(tpl if mask is None else tpl * mask).var(axis=1))
+        found = []
+        for start in range(0, ys.size, self.chunk):
+            cy, cx = ys[start:start + self.chunk], xs[start:start + self.chunk]
+            ssd = np.zeros(cy.size, dtype=np.float64)
+            for r in order:
+                row = gray[cy[:, None] + r, cx[:, None] + cols] - tpl[r]
+                if mask is not None:
+                    row *= mask[r]
+                ssd += np.einsum("ij,ij->i", row, row)
+                keep = ssd <= budget
+                if not keep.all():
+                    cy, cx, ssd = cy[keep], cx[keep], ssd[keep]
+                    if cy.size == 0:
+                        break
+            if cy.size:
+                found.append((cy, cx, ssd))
+                budget = float(ssd.min())
+        if not found:
+            return ys[:0], xs[:0], np.zeros(0)
+        return tuple(np.concatenate(parts) for parts in zip(*found))
+
+    def _ssd_map(self, frame: Frame, template) -> np.ndarray:
+        """SSD of every window as sum(I^2) - 2 sum(IT) + sum(T^2), over visible pixels."""
+        tpl = template.pixels.astype(np.float64)
+        th, tw = tpl.shape
+        mask = getattr(template, "mask", None)
+        ncc = NCCMatcher()
+        if mask is None:
+            s, s2 = frame.integrals()
+            sq_sums = window_sums(s2, th, tw)
+        else:
+            tpl = tpl * mask
+            _, sq_sums = ncc._masked_window_sums(frame, template)
+        # float64 throughout: the three terms nearly cancel at the best windows
+        cross = ncc._correlate(frame, "gray", tpl, template, "ssd", np.float64)
+        return sq_sums - 2.0 * cross + float((tpl * tpl).sum())
+
+
+class PyAutoGuiMatcher(Matcher):
+    """Fallback backend delegating to `pyautogui.locate`.
+
+    Confidence matching in pyautogui requires OpenCV; without it this
+    backend falls back to exact matching and reports a score of 1.0.
+    """
+
+    name = "pyautogui"
+
+    def match(self, frame: Frame, template, threshold: float = 0.8) -> Optional[Match]:
+        import pyautogui
+
+        haystack = frame.image.convert("RGB")
+        score = threshold
+        try:
+            try:
+                box = pyautogui.locate(template.image, haystack, confidence=threshold)
+            except (NotImplementedError, TypeError):
+                box = pyautogui.locate(template.image, haystack)
+                score = 1.0
+        except Exception:
+            box = None
+        if not box:
+            return None
+        ox, oy = frame.origin
+        return Match(ox + box.left, oy + box.top, box.width, box.height, score)
+
+
+class ClassMatcher:
+    """Matches every template variant of a class against one frame.
+
+    All variants share the frame's cached preprocessing (grayscale pixels,
+    integral images, pyramid levels). Variants at the scale that matched
+    last for their class are tried first, then the rest in order of their
+    historical hit rate; the search stops at the first one scoring at
+    least the threshold.
+    """
+
+    def __init__(self, matcher: Matcher):
+        self.matcher = matcher
+        # template key -> [hits, attempts]
+        self._stats: Dict[str, list] = {}
+        # class directory -> scale of the last matching variant
+        self._last_scale: Dict[str, float] = {}
+
+    def ordered(self, templates: Sequence) -> list:
+        """Templates sorted best first (stable for ties)."""
+        def rank(t):
+            hits, tries = self._stats.get(_template_key(t), (0, 0))
+            last = self._last_scale.get(str(t.path.parent))
+            return (getattr(t, "scale", 1.0) == last, (hits + 1) / (tries + 2))
+        return sorted(templates, key=rank, reverse=True)
+
+    def match(self, frame: Frame, templates: Sequence, threshold: float = 0.8) -> Optional[Match]:
+        for template in self.ordered(templates):
+            m = self.matcher.match(frame, template, threshold)
+            stats = self._stats.setdefault(_template_key(template), [0, 0])
+            stats[1] += 1
+            if m:
+                stats[0] += 1
+                self._last_scale[str(template.path.parent)] = getattr(template, "scale", 1.0)
+                m.template = template
+                return m
+        return None
+
+    def hit_rates(self) -> Dict[str, float]:
+        return {key: hits / tries for key, (hits, tries) in self._stats.items() if tries}
+
+
+def _template_key(template) -> str:
+    return getattr(template, "key", None) or str(template.path)
+
+
+_MATCHERS: Dict[str, type] = {
+    NCCMatcher.name: NCCMatcher,
+    PyramidMatcher.name: PyramidMatcher,
+    SSDMatcher.name: SSDMatcher,
+    PyAutoGuiMatcher.name: PyAutoGuiMatcher,
+}
+
+# backends living in optional modules, imported on first use: name -> module path
+_LAZY_MATCHERS: Dict[str, str] = {
+    "parallel": "engine.parallel",
+}
+
+DEFAULT_MATCHER = PyramidMatcher.name
+
+
+def get_matcher(name: Optional[str] = None) -> Matcher:
+    """Return a matcher backend by name (defaults to pyramid NCC)."""
+    key = (name or DEFAULT_MATCHER).lower()
+    if key not in _MATCHERS and key in _LAZY_MATCHERS:
+        # importing the module registers its backend
+        importlib.import_module(_LAZY_MATCHERS[key])
+    cls = _MATCHERS.get(key)
+    if cls is None:
+        raise ValueError(f"Unknown matcher backend: {name}")
+    return cls()
+
+
+def register_matcher(cls: type) -> type:
+    """Register an additional Matcher subclass under its `name`."""
+    _MATCHERS[cls.name] = cls
+    return cls
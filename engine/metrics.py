@@ -0,0 +1,191 @@
+"""Executor metrics in the Prometheus text exposition format.
+
+`ExecutorMetrics` counts what a `WorkflowExecutor` publishes (iterations,
+steps, match results) and reads its search and capture counters when
+scraped. `MetricsServer` serves it over HTTP with the standard library
+only, bound to localhost by default:
+
+    executor.serve_metrics(9464)
+    curl -s localhost:9464/metrics
+"""
+import bisect
+import collections
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from .events import Event
+
+log = logging.getLogger("autoai.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds from the start of a find step's search to its result
+MATCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# window of the steps-per-second gauge
+RATE_WINDOW = 60.0
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Buckets:
+    """Fixed-bucket histogram as Prometheus expects it (cumulative on output)."""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str) -> List[str]:
+        out, seen = [], 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            seen += n
+            out.append(f'{name}_bucket{{le="{_number(bound)}"}} {seen}')
+        out.append(f"{name}_sum {_number(self.sum)}")
+        out.append(f"{name}_count {self.count}")
+        return out
+
+
+class ExecutorMetrics:
+    """Counters and histograms for one executor, across all of its runs."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._lock = threading.Lock()
+        self.iterations = 0
+        self.steps: Dict[str, int] = collections.Counter()
+        # (class, "hit"/"miss") -> count
+        self.matches: Dict[Tuple[str, str], int] = collections.Counter()
+        self.match_seconds = _Buckets(MATCH_BUCKETS)
+        self._step_times = collections.deque()
+
+    def observe(self, event: Event):
+        """Account for one executor event; called from the run thread."""
+        kind = event.kind
+        if kind not in ("iteration_done", "step_finished", "match_result"):
+            return
+        with self._lock:
+            if kind == "iteration_done":
+                self.iterations += 1
+            elif kind == "step_finished":
+                self.steps[event.type] += 1
+                now = time.monotonic()
+                self._step_times.append(now)
+                while self._step_times and self._step_times[0] < now - RATE_WINDOW:
+                    self._step_times.popleft()
+            else:
+                result = "hit" if event.match is not None else "miss"
+                self.matches[(event.class_name or "", result)] += 1
+                self.match_seconds.observe(event.elapsed)
+
+    def steps_per_second(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for t in self._step_times if t >= now - RATE_WINDOW)
+        return recent / RATE_WINDOW
+
+    def render(self) -> str:
+        """All metrics in the text exposition format."""
+        ex = self.executor
+        out: List[str] = []
+
+        def metric(name, kind, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                out.append(f"{name}{_labels(**labels)} {_number(value)}")
+
+        steps_per_second = self.steps_per_second()
+        with self._lock:
+            metric("autoai_iterations_total", "counter", "Workflow iterations completed.", [({}, self.iterations)])
+            metric("autoai_steps_total", "counter", "Steps completed, by step type.",
+                   [({"type": t}, n) for t, n in sorted(self.steps.items())])
+            metric("autoai_steps_per_second", "gauge", f"Steps completed per second over the last {RATE_WINDOW:.0f} s.",
+                   [({}, steps_per_second)])
+            metric("autoai_matches_total", "counter", "Find step searches, by class and result (hit/miss).",
+                   [({"class": c, "result": r}, n) for (c, r), n in sorted(self.matches.items())])
+            hits = sum(n for (_, r), n in self.matches.items() if r == "hit")
+            total = sum(self.matches.values())
+            metric("autoai_match_hit_ratio", "gauge", "Share of find step searches that found their target.",
+                   [({}, hits / total if total else 0.0)])
+            out.append("# HELP autoai_match_seconds Time from the start of a find step's search to its result.")
+            out.append("# TYPE autoai_match_seconds histogram")
+            out.extend(self.match_seconds.lines("autoai_match_seconds"))
+
+        metric("autoai_search_retries_total", "counter", "Screen searches repeated after a miss.",
+               [({}, ex.search_retries)])
+        capture = ex.capture_stats()
+        metric("autoai_capture_frames_total", "counter", "Frames grabbed by background capture.",
+               [({}, capture["frames"])])
+        metric("autoai_capture_dropped_total", "counter", "Background grabs skipped because every buffer was in use.",
+               [({}, capture["dropped"])])
+        metric("autoai_capture_errors_total", "counter", "Background grabs that failed.", [({}, capture["errors"])])
+        metric("autoai_capture_fps", "gauge", "Frame rate background capture is delivering (0 when not running).",
+               [({}, capture["fps"])])
+        return "\n".join(out) + "\n"
+
+
+class MetricsServer:
+    """Serves `metrics.render()` at /metrics on a daemon thread."""
+
+    def __init__(self, metrics: ExecutorMetrics, port: int = 9464, host: str = "127.0.0.1"):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?")[0] not in ("/", "/metrics"):
+                    handler.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, fmt, *args):
+                log.debug("%s " + fmt, handler.address_string(), *args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="autoai-metrics", daemon=True)
+        self._thread.start()
+        log.info("Serving metrics on http://%s:%d/metrics", *self.address)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
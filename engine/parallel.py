@@ -0,0 +1,165 @@
+"""Process-pool template matching across overlapping screen bands.
+
+Matching is CPU-bound, so large frames are split into horizontal bands
+that overlap by the template height and matched on a persistent pool of
+worker processes. The frame is published once into a
+`multiprocessing.shared_memory` block that workers map by name; only the
+(small) template pixels travel through pickling. The pool and the shared
+block live for the whole process, so spawn cost is paid once.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from .matching import Frame, Match, Matcher, get_matcher, register_matcher
+
+log = logging.getLogger("autoai.parallel")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return the process-wide matching pool, starting it on first use.
+
+    Workers are spawned (not forked) so they never inherit GTK or display
+    state from the parent.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # workers must share the parent's resource tracker, otherwise each
+            # would unlink the shared frame block when it exits
+            resource_tracker.ensure_running()
+            ctx = multiprocessing.get_context("spawn")
+            workers = workers or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+            atexit.register(shutdown_pool)
+            log.info("Started matching pool with %d workers", workers)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# --- worker side -----------------------------------------------------------
+
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = _attached.get(name)
+    if shm is None:
+        # the parent republishes under a new name when frames grow; drop stale maps
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm
+
+
+def _match_band(shm_name: str, shape, y0: int, y1: int, pixels: np.ndarray, mask: Optional[np.ndarray],
+                threshold: float, backend: str):
+    from .templates import Template
+
+    shm = _attach(shm_name)
+    gray = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    band = Frame(gray=gray[y0:y1], origin=(0, y0))
+    m = get_matcher(backend).match(band, Template("<shared>", None, pixels=pixels, mask=mask), threshold)
+    return (m.x, m.y, m.score) if m else None
+
+
+# --- parent side -----------------------------------------------------------
+
+class _SharedFrame:
+    """A grow-only shared memory block holding the most recently published frame."""
+
+    def __init__(self):
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.shape = None
+        # the published frame, held weakly: owning it would pin its capture slot and caches
+        self._frame: Optional[weakref.ref] = None
+
+    def publish(self, frame: Frame):
+        if self._frame is not None and self._frame() is frame:
+            return
+        gray = frame.gray
+        if self.shm is None or self.shm.size < gray.nbytes:
+            self.close()
+            self.shm = shared_memory.SharedMemory(create=True, size=gray.nbytes)
+        self.shape = gray.shape
+        np.ndarray(gray.shape, dtype=np.float32, buffer=self.shm.buf)[:] = gray
+        self._frame = weakref.ref(frame)
+
+    def close(self):
+        self._frame = None
+        if self.shm is not None:
+            try:
+                self.shm.close()
+                self.shm.unlink()
+            except Exception:
+                pass
+            self.shm = None
+
+
+class ParallelMatcher(Matcher):
+    """Runs another backend over overlapping frame bands on the process pool.
+
+    Frames smaller than `min_pixels` (e.g. ROI crops) are matched inline,
+    where pool dispatch would cost more than it saves.
+    """
+
+    name = "parallel"
+
+    def __init__(self, backend: str = "ncc", workers: Optional[int] = None, min_pixels: int = 640 * 480):
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.min_pixels = min_pixels
+        self._inline = get_matcher(backend)
+        self._shared = _SharedFrame()
+        # one dispatch at a time: the shared block holds a single frame
+        self._lock = threading.Lock()
+        atexit.register(self._shared.close)
+
+    def match(self, frame: Frame, template, threshold: float = 0.8) -> Optional[Match]:
+        fh, fw = frame.shape
+        th = template.height
+        if fh * fw < self.min_pixels or self.workers < 2 or th > fh:
+            return self._inline.match(frame, template, threshold)
+
+        with self._lock:
+            self._shared.publish(frame)
+            starts = fh - th + 1
+            step = -(-starts // self.workers)
+            pool = get_pool(self.workers)
+            futures = []
+            for y0 in range(0, starts, step):
+                # each band holds every window whose top row falls in [y0, y0 + step)
+                y1 = min(fh, y0 + step + th - 1)
+                futures.append(pool.submit(_match_band, self._shared.shm.name, self._shared.shape,
+                                           y0, y1, template.pixels, template.mask, threshold, self.backend))
+            results = [f.result() for f in futures]
+
+        found = [r for r in results if r]
+        if not found:
+            return None
+        x, y, score = max(found, key=lambda r: r[2])
+        ox, oy = frame.origin
+        return Match(ox + x, oy + y, template.width, template.height, score)
+
+
+register_matcher(ParallelMatcher)
@@ -0,0 +1,222 @@
+"""Workflows compiled into immutable step plans.
+
+`compile_plan()` validates every step's params once, resolves class
+matchers and thresholds and binds each step to its executor handler, so
+the run loop only calls `step.run()`. Invalid workflows raise PlanError
+before any step executes.
+"""
+from typing import Callable, Dict, Optional, Tuple
+
+Box = Tuple[int, int, int, int]
+
+
+class PlanError(ValueError):
+    """A workflow step with missing or invalid params."""
+
+    def __init__(self, index: int, stype, message: str):
+        super().__init__(f"Step {index} ({stype}): {message}")
+        self.index = index
+
+
+class Step:
+    """One compiled step. Steps are immutable once built."""
+
+    __slots__ = ("index", "type", "params", "label", "handler", "prefetch")
+
+    def __init__(self, index: int, stype: str, params: dict, label: str, handler: Callable, **fields):
+        set_ = object.__setattr__
+        set_(self, "index", index)
+        set_(self, "type", stype)
+        set_(self, "params", params)
+        # progress message, formatted once
+        set_(self, "label", label)
+        set_(self, "handler", handler)
+        # find step to search for in the background while this one runs
+        set_(self, "prefetch", None)
+        for name, value in fields.items():
+            set_(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def run(self, driver, dry_run: bool):
+        return self.handler(self, driver, dry_run)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.index}, {self.type!r})"
+
+
+class DelayStep(Step):
+    __slots__ = ("seconds",)
+
+
+class TypeTextStep(Step):
+    __slots__ = ("text",)
+
+
+class KeyPressStep(Step):
+    __slots__ = ("key",)
+
+
+class FindStep(Step):
+    """FindAndClick (one class, always clicks) or FindAny (best of several)."""
+
+    __slots__ = ("classes", "retries", "timeout", "click", "any", "region", "anchor", "candidates")
+
+
+class UnknownStep(Step):
+    """Unrecognised step type; only compiled for dry runs, where it is logged."""
+
+    __slots__ = ()
+
+
+class Plan:
+    __slots__ = ("name", "steps")
+
+    def __init__(self, name: str, steps: Tuple[Step, ...]):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "steps", steps)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Plan is immutable")
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+
+# step type (lowercased) -> canonical name
+_ALIASES: Dict[str, str] = {
+    "delay": "Delay",
+    "typetext": "TypeText", "type_text": "TypeText",
+    "keypress": "KeyPress", "key_press": "KeyPress",
+    "findandclick": "FindAndClick", "find_and_click": "FindAndClick", "findclick": "FindAndClick",
+    "findany": "FindAny", "find_any": "FindAny",
+}
+
+# steps that leave the screen alone long enough to search for the next find meanwhile
+PREFETCH_DURING = ("Delay", "TypeText")
+
+
+def _number(params: dict, key: str, default, cast, fail):
+    value = params.get(key, default)
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        fail(f"'{key}' must be a number, got {value!r}")
+
+
+def parse_region(value) -> Optional[Box]:
+    """Parse a step's `region` param: [x, y, w, h] or "x, y, w, h"; empty gives None."""
+    if value is None or value == "" or value == []:
+        return None
+    if isinstance(value, str):
+        value = value.replace(",", " ").split()
+    try:
+        x, y, w, h = (int(float(v)) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid region {value!r}; expected x, y, width, height")
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Invalid region {value!r}; width and height must be positive")
+    return (x, y, w, h)
+
+
+def _parse_region(value, fail) -> Optional[Box]:
+    try:
+        return parse_region(value)
+    except ValueError as e:
+        fail(str(e))
+
+
+def compile_step(index: int, step: dict, executor, dry_run: bool = False, total: int = 1) -> Step:
+    """Validate one workflow step dict and bind it to `executor`'s handler."""
+    if not isinstance(step, dict):
+        raise PlanError(index, type(step).__name__, "step must be a mapping")
+    raw_type = step.get("type")
+    params = dict(step.get("params") or {})
+    kind = _ALIASES.get(str(raw_type).lower())
+
+    def fail(message):
+        raise PlanError(index, raw_type, message)
+
+    label = f"Step {index}/{total}: {raw_type} {params}"
+    if kind is None:
+        if not dry_run:
+            fail("unknown step type")
+        return UnknownStep(index, str(raw_type), params, label, executor._do_unknown)
+
+    if kind == "Delay":
+        seconds = _number(params, "seconds", 1.0, float, fail)
+        if seconds < 0:
+            fail("'seconds' must not be negative")
+        return DelayStep(index, kind, params, label, executor._do_delay, seconds=seconds)
+
+    if kind == "TypeText":
+        text = params.get("text", "")
+        if not isinstance(text, str):
+            fail("'text' must be a string")
+        return TypeTextStep(index, kind, params, label, executor._do_type_text, text=text)
+
+    if kind == "KeyPress":
+        key = params.get("key", "")
+        if not isinstance(key, str) or not key:
+            fail("'key' is required")
+        return KeyPressStep(index, kind, params, label, executor._do_key_press, key=key)
+
+    # find steps
+    if kind == "FindAny":
+        classes = params.get("classes") or []
+        if isinstance(classes, str):
+            classes = [c.strip() for c in classes.split(",") if c.strip()]
+        if not classes:
+            fail("'classes' is required")
+        click = bool(params.get("click", True))
+    else:
+        classes = [params.get("class") or params.get("class_name")]
+        if not classes[0]:
+            fail("'class' is required")
+        click = True
+    retries = _number(params, "retries", 3, int, fail)
+    if retries < 0:
+        fail("'retries' must not be negative")
+    # seconds to keep polling; None defers to the run's default timeout
+    timeout = params.get("timeout")
+    if timeout is not None:
+        timeout = _number(params, "timeout", None, float, fail)
+        if timeout < 0:
+            fail("'timeout' must not be negative")
+
+    confidence = params.get("confidence")
+    if confidence is not None:
+        confidence = _number(params, "confidence", None, float, fail)
+        if not 0.0 < confidence <= 1.0:
+            fail("'confidence' must be in (0, 1]")
+    matcher_name = params.get("matcher")
+    region = _parse_region(params.get("region"), fail)
+    anchor = params.get("anchor") or None
+    if anchor and region is None:
+        fail(f"anchor '{anchor}' given without a region")
+
+    index_ = executor._template_index()
+    for name in classes + ([anchor] if anchor else []):
+        if name not in index_:
+            fail(f"no templates for class '{name}'")
+    try:
+        # (class, ClassMatcher, threshold); templates themselves are looked up per search
+        candidates = tuple((name,) + executor._resolve(name, matcher_name, confidence) for name in classes)
+    except ValueError as e:
+        fail(str(e))
+    return FindStep(index, kind, params, label, executor._do_find, classes=tuple(classes), retries=retries,
+                    timeout=timeout, click=click, any=kind == "FindAny", region=region, anchor=anchor, candidates=candidates)
+
+
+def compile_plan(workflow, executor, dry_run: bool = False) -> Plan:
+    """Compile `workflow` (a storage Workflow or a list of step dicts) for `executor`."""
+    raw = getattr(workflow, "steps", workflow) or []
+    steps = [compile_step(i, s, executor, dry_run, len(raw)) for i, s in enumerate(raw, start=1)]
+    for step, nxt in zip(steps, steps[1:]):
+        if step.type in PREFETCH_DURING and isinstance(nxt, FindStep):
+            object.__setattr__(step, "prefetch", nxt)
+    return Plan(getattr(workflow, "name", ""), tuple(steps))
@@ -0,0 +1,91 @@
+import collections
+from typing import Deque, Dict, List, Optional, Tuple
+
+Box = Tuple[int, int, int, int]
+
+
+class _ClassPrior:
+    def __init__(self, history: int):
+        self.last: Optional[Box] = None
+        self.centers: Deque[Tuple[int, int]] = collections.deque(maxlen=history)
+        self.hits = 0
+        self.misses = 0
+
+
+class RegionPriors:
+    """Remembers where each class was last matched so searches start there.
+
+    For every class we keep the last match box and a short history of match
+    centers bucketed into `cell`-sized grid cells (a small heatmap). The
+    executor searches `regions()` in order and only falls back to the full
+    frame when none of them contains the target; `record()` keeps the
+    hit/miss counters for that ROI cache.
+    """
+
+    def __init__(self, margin: float = 1.0, cell: int = 64, history: int = 32, hot_cells: int = 2):
+        # margin: ROI grows by this fraction of the template size on each side
+        self.margin = margin
+        self.cell = cell
+        self.history = history
+        self.hot_cells = hot_cells
+        self._classes: Dict[str, _ClassPrior] = {}
+
+    def _prior(self, class_name: str) -> _ClassPrior:
+        prior = self._classes.get(class_name)
+        if prior is None:
+            prior = self._classes[class_name] = _ClassPrior(self.history)
+        return prior
+
+    def regions(self, class_name: str, size: Tuple[int, int]) -> List[Box]:
+        """ROIs (x, y, w, h) to search for a template of `size` (w, h), most likely first."""
+        prior = self._classes.get(class_name)
+        if prior is None or prior.last is None:
+            return []
+        tw, th = size
+        mx, my = int(tw * self.margin) + 1, int(th * self.margin) + 1
+        lx, ly, lw, lh = prior.last
+        out = [(lx - mx, ly - my, lw + 2 * mx, lh + 2 * my)]
+
+        heat = collections.Counter((cx // self.cell, cy // self.cell) for cx, cy in prior.centers)
+        last_cell = ((lx + lw // 2) // self.cell, (ly + lh // 2) // self.cell)
+        for (gx, gy), _ in heat.most_common(self.hot_cells + 1):
+            if (gx, gy) == last_cell:
+                continue
+            # a cell holds the template center, so cover the template around it
+            out.append((gx * self.cell - tw // 2 - mx, gy * self.cell - th // 2 - my,
+                        self.cell + tw + 2 * mx, self.cell + th + 2 * my))
+            if len(out) > self.hot_cells:
+                break
+        return out
+
+    def record(self, class_name: str, box: Optional[Box], in_roi: Optional[bool]):
+        """Record a search outcome; `box` is the match box or None if not found.
+
+        `in_roi` None records only the location, for searches that did not
+        try the ROIs first (and so are neither a hit nor a miss).
+        """
+        prior = self._prior(class_name)
+        if in_roi:
+            prior.hits += 1
+        elif in_roi is not None and prior.last is not None:
+            # only count searches that actually had a prior region to try
+            prior.misses += 1
+        if box is not None:
+            prior.last = tuple(box)
+            x, y, w, h = box
+            prior.centers.append((x + w // 2, y + h // 2))
+
+    def forget(self, class_name: Optional[str] = None):
+        if class_name is None:
+            self._classes.clear()
+        else:
+            self._classes.pop(class_name, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-class ROI cache counters plus a `total` entry."""
+        out = {name: {"hits": p.hits, "misses": p.misses} for name, p in self._classes.items()}
+        out["total"] = {
+            "hits": sum(p.hits for p in self._classes.values()),
+            "misses": sum(p.misses for p in self._classes.values()),
+        }
+        return out
@@ -0,0 +1,159 @@
+"""Run a workflow from the command line, without the GTK app.
+
+    python -m engine.run projects/foo/workflows/foo.yaml --loop 100 --dry-run
+    python -m engine.run foo.yaml --infinite --json --metrics-port 9464
+
+Progress goes to stdout, as text or (with --json) one JSON event per
+line. The exit status is 0 when the workflow completed, 1 when it failed
+or was stopped (SIGINT/SIGTERM stop the run cleanly) and 2 for a
+workflow that could not be loaded. With --replay (or --no-input) find
+steps match for real but nothing is clicked or typed. Only the engine
+and storage packages are imported; NumPy and PIL are loaded by the run
+itself, once it starts.
+"""
+import argparse
+import json
+import os
+import pathlib
+import signal
+import sys
+import time
+
+# seconds between drains of the event queue
+_DRAIN_INTERVAL = 0.05
+
+
+def _projects_dir(workflow_path: pathlib.Path):
+    """The projects directory of `<projects>/<project>/workflows/<name>.yaml`, else None."""
+    parent = workflow_path.resolve().parent
+    if parent.name == "workflows":
+        return parent.parent.parent
+    return None
+
+
+def _options(args) -> dict:
+    options = {"prefetch": not args.no_prefetch}
+    if args.infinite:
+        options.update(loop=True, infinite=True)
+    elif args.loop > 1:
+        options.update(loop=True, loop_count=args.loop)
+    if args.delay:
+        options["delay"] = args.delay
+    if args.timeout is not None:
+        options["timeout"] = args.timeout
+    if args.period:
+        options.update(schedule="fixed_rate", period=args.period)
+    if args.capture_fps:
+        options["capture_fps"] = args.capture_fps
+    if args.metrics_port:
+        options["metrics_port"] = args.metrics_port
+    if args.no_input or args.replay:
+        # coordinates from recorded screenshots must never reach the live screen
+        options["no_input"] = True
+    return options
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m engine.run", description=__doc__.splitlines()[0])
+    parser.add_argument("workflow", help="workflow YAML file")
+    loop = parser.add_mutually_exclusive_group()
+    loop.add_argument("--loop", type=int, default=1, metavar="N", help="run the workflow N times")
+    loop.add_argument("--infinite", action="store_true", help="loop until stopped")
+    parser.add_argument("--dry-run", action="store_true", help="log steps instead of sending input")
+    parser.add_argument("--no-input", action="store_true",
+                        help="run find steps but log clicks and keystrokes instead of sending them (implied by --replay)")
+    parser.add_argument("--json", action="store_true", help="print events as JSON lines")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds between steps")
+    parser.add_argument("--timeout", type=float, help="default find timeout in seconds")
+    parser.add_argument("--period", type=float, help="start an iteration every PERIOD seconds")
+    parser.add_argument("--capture-fps", type=float, default=0.0, help="grab frames in the background at this rate")
+    parser.add_argument("--no-prefetch", action="store_true", help="do not search for find steps ahead of time")
+    parser.add_argument("--matcher", help="default matcher backend")
+    parser.add_argument("--source", help="live screen source, or auto for the fastest (see python -m engine.sources)")
+    parser.add_argument("--replay", metavar="DIR", help="match against recorded screenshots instead of the screen")
+    parser.add_argument("--projects", help="projects directory (default: inferred from the workflow path)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on localhost:PORT")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log to stderr")
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        import logging
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    import yaml
+    from storage.workflow import Workflow
+
+    path = pathlib.Path(args.workflow)
+    try:
+        workflow = Workflow.load(path)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"Cannot load {path}: {e}", file=sys.stderr)
+        return 2
+
+    executor = None
+
+    def emit(record: dict, text: str):
+        try:
+            print(json.dumps(record, default=str) if args.json else text, flush=True)
+        except BrokenPipeError:
+            # the reader went away (e.g. `| head`): stop quietly
+            sys.stdout = open(os.devnull, "w")
+            if executor is not None:
+                executor.stop()
+
+    emit({"kind": "loaded", "workflow": workflow.name, "steps": len(workflow.steps)},
+         f"Loaded {workflow.name} ({len(workflow.steps)} steps)")
+
+    from .events import EventQueue
+    from .executor import WorkflowExecutor
+
+    source = None
+    if args.replay:
+        from .sources import ReplaySource
+        source = ReplaySource(args.replay)
+    elif args.source:
+        from .sources import get_source
+        source = get_source(args.source)
+    executor = WorkflowExecutor(matcher=args.matcher, source=source)
+    projects = pathlib.Path(args.projects) if args.projects else _projects_dir(path)
+    if projects is not None:
+        executor.projects_dir = projects
+
+    def on_signal(signum, frame):
+        executor.stop()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    events = EventQueue(maxlen=4096)
+    result = {}
+
+    def on_finished(success: bool, message: str):
+        result.update(success=success, message=message)
+
+    def drain():
+        for event in events.drain():
+            emit(event.to_dict(), event.text())
+
+    started = time.monotonic()
+    thread = executor.run(workflow, dry_run=args.dry_run, options=_options(args), on_finished=on_finished,
+                          events=events)
+    while thread.is_alive():
+        thread.join(_DRAIN_INTERVAL)
+        drain()
+    drain()
+    executor.stop_metrics()
+    if source is not None:
+        source.close()
+
+    success = bool(result.get("success"))
+    elapsed = time.monotonic() - started
+    if events.dropped:
+        print(f"{events.dropped} events dropped", file=sys.stderr)
+    emit({"kind": "finished", "success": success, "message": result.get("message"), "elapsed": elapsed},
+         f"Finished ({result.get('message')}) in {elapsed:.2f} s")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
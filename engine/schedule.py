@@ -0,0 +1,95 @@
+"""Fixed-rate scheduling and polling backoff against the monotonic clock."""
+import math
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+POLICIES = ("skip", "catch_up")
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+
+class FixedRateSchedule:
+    """Ticks at `start + n * period`, so slow iterations never shift later ones.
+
+    When a tick is missed by a whole period or more, `policy` decides:
+    `skip` drops the missed ticks and runs once, late, for the most recent
+    one (keeping the original phase); `catch_up` runs every missed tick
+    back to back until the schedule is on time again.
+
+    `lateness` holds, per tick, how long after its deadline it started.
+    """
+
+    def __init__(self, period: float, policy: str = "skip"):
+        if period <= 0:
+            raise ValueError(f"Schedule period must be positive, got {period}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown schedule policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        self.period = period
+        self.policy = policy
+        self._start: Optional[float] = None
+        self._tick = 0
+        self.deadline: Optional[float] = None
+        self.lateness: List[float] = []
+        self.skipped = 0
+
+    def start(self, now: Optional[float] = None):
+        self._start = time.monotonic() if now is None else now
+        self._tick = 0
+        self.deadline = None
+        self.lateness = []
+        self.skipped = 0
+        return self
+
+    def next_deadline(self) -> float:
+        """Deadline of the next tick, after applying the policy to missed ones."""
+        if self._start is None:
+            self.start()
+        deadline = self._start + self._tick * self.period
+        if self.policy == "skip":
+            missed = int((time.monotonic() - deadline) // self.period)
+            if missed > 0:
+                self._tick += missed
+                self.skipped += missed
+                deadline += missed * self.period
+        return deadline
+
+    def wait(self, sleep: Callable[[float], bool]) -> bool:
+        """Sleep until the next tick with `sleep(seconds)`; False if it was interrupted."""
+        deadline = self.next_deadline()
+        if not wait_until(deadline, sleep):
+            return False
+        self.lateness.append(max(0.0, time.monotonic() - deadline))
+        self.deadline = deadline
+        self._tick += 1
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Tick count, skipped ticks and lateness percentiles in milliseconds."""
+        late = sorted(self.lateness)
+        return {
+            "ticks": len(late),
+            "skipped": self.skipped,
+            "mean_ms": 1000 * sum(late) / len(late) if late else 0.0,
+            "p50_ms": 1000 * _percentile(late, 0.50),
+            "p95_ms": 1000 * _percentile(late, 0.95),
+            "max_ms": 1000 * (late[-1] if late else 0.0),
+        }
+
+
+def wait_until(deadline: float, sleep: Callable[[float], bool]) -> bool:
+    """Sleep until monotonic `deadline` with `sleep(seconds)`; False if interrupted."""
+    delay = deadline - time.monotonic()
+    return sleep(delay) if delay > 0 else True
+
+
+def backoff(initial: float = 0.05, factor: float = 2.0, maximum: float = 1.0) -> Iterator[float]:
+    """Poll intervals: `initial`, then growing by `factor` up to `maximum`."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(maximum, delay * factor)
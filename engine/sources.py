@@ -0,0 +1,301 @@
+"""Screen sources: where captured frames come from.
+
+A `ScreenSource` returns the screen (or a region of it) as an (h, w, 3)
+uint8 RGB array. Live sources wrap a capture library; `ReplaySource`
+serves recorded screenshots so matching can be benchmarked and
+regression-tested without a display.
+
+    python -m engine.sources                      # time every live backend
+    python -m engine.sources --replay DIR --classes ok,cancel
+    python -m engine.run flow.yaml --source auto  # run with the fastest one
+"""
+import argparse
+import logging
+import pathlib
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+log = logging.getLogger("autoai.sources")
+
+Region = Tuple[int, int, int, int]
+
+
+class ScreenSource(ABC):
+    name = "base"
+    # live sources read the display; replay sources read files
+    live = True
+
+    @classmethod
+    def available(cls) -> bool:
+        """Whether the backend's library imports; the display may still refuse."""
+        return True
+
+    @abstractmethod
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        """Return the screen, or `region` (x, y, w, h) of it, as RGB uint8."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiSource(ScreenSource):
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            import pyautogui  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        img = self._pyautogui.screenshot(region=tuple(region)) if region else self._pyautogui.screenshot()
+        return np.asarray(img.convert("RGB"))
+
+
+class ImageGrabSource(ScreenSource):
+    name = "imagegrab"
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            from PIL import ImageGrab  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        bbox = None
+        if region:
+            x, y, w, h = region
+            bbox = (x, y, x + w, y + h)
+        return np.asarray(self._grab(bbox=bbox).convert("RGB"))
+
+
+class XlibSource(ScreenSource):
+    """Reads the root window over one persistent X connection.
+
+    Much cheaper per frame than the tools that open a connection (or spawn
+    a process) per screenshot. Assumes a 24/32-bit TrueColor visual.
+
+    Frames come from the core `GetImage` request, so pixels still travel
+    over the X socket: python-xlib has no MIT-SHM (XShm) binding, which
+    would let the server write into shared memory instead.
+    """
+
+    name = "xlib"
+
+    def __init__(self):
+        from Xlib import X, display
+        self._zpixmap = X.ZPixmap
+        self._display = display.Display()
+        self._root = self._display.screen().root
+        geo = self._root.get_geometry()
+        self.size = (geo.width, geo.height)
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            import Xlib.display  # noqa: F401
+            return True
+        except Exception:
+            return False
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        x, y, w, h = region or (0, 0) + self.size
+        # GetImage fails with BadMatch for a rectangle reaching outside the root window
+        sw, sh = self.size
+        x0, y0 = max(0, x), max(0, y)
+        w, h = min(sw, x + w) - x0, min(sh, y + h) - y0
+        x, y = x0, y0
+        if w <= 0 or h <= 0:
+            return np.zeros((max(0, h), max(0, w), 3), dtype=np.uint8)
+        raw = self._root.get_image(x, y, w, h, self._zpixmap, 0xFFFFFFFF)
+        bgrx = np.frombuffer(raw.data, dtype=np.uint8).reshape(h, w, 4)
+        return bgrx[..., 2::-1]
+
+    def close(self):
+        try:
+            self._display.close()
+        except Exception:
+            pass
+
+
+class ReplaySource(ScreenSource):
+    """Serves the `*.png` files of a directory in name order, one per grab.
+
+    With `loop` the sequence restarts after the last file, otherwise the
+    last frame keeps being returned. Decoded frames are cached so grabs
+    cost no PNG decoding after the first pass.
+    """
+
+    name = "replay"
+    live = False
+
+    def __init__(self, directory, loop: bool = True):
+        self.directory = pathlib.Path(directory)
+        self.paths = sorted(self.directory.glob("*.png"))
+        if not self.paths:
+            raise FileNotFoundError(f"No screenshots in {self.directory}")
+        self.loop = loop
+        self._cache: Dict[int, np.ndarray] = {}
+        self._pos = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def rewind(self):
+        self._pos = 0
+
+    def grab(self, region: Optional[Region] = None) -> np.ndarray:
+        i = self._pos
+        if self._pos + 1 < len(self.paths):
+            self._pos += 1
+        elif self.loop:
+            self._pos = 0
+        pixels = self._cache.get(i)
+        if pixels is None:
+            with Image.open(self.paths[i]) as im:
+                pixels = self._cache[i] = np.asarray(im.convert("RGB"))
+        if region:
+            x, y, w, h = region
+            pixels = pixels[max(0, y):y + h, max(0, x):x + w]
+        return pixels
+
+
+# live backends in default preference order
+_SOURCES: Dict[str, type] = {
+    XlibSource.name: XlibSource,
+    ImageGrabSource.name: ImageGrabSource,
+    PyAutoGuiSource.name: PyAutoGuiSource,
+}
+
+
+def available_sources() -> List[str]:
+    return [name for name, cls in _SOURCES.items() if cls.available()]
+
+
+def get_source(name: Optional[str] = None) -> Optional[ScreenSource]:
+    """Open a live source by name, or the first one that can grab the screen.
+
+    `auto` times every working backend on this host and keeps the fastest
+    (see `fastest_source()`). Returns None when no backend works (e.g. no
+    display).
+    """
+    if name and name.lower() == "auto":
+        return fastest_source()
+    if name:
+        cls = _SOURCES.get(name.lower())
+        if cls is None:
+            raise ValueError(f"Unknown screen source: {name}")
+        return cls()
+    for cls in _SOURCES.values():
+        if not cls.available():
+            continue
+        try:
+            source = cls()
+            source.grab((0, 0, 1, 1))
+            return source
+        except Exception:
+            log.debug("Screen source %s unusable", cls.name, exc_info=True)
+    return None
+
+
+def time_grabs(source: ScreenSource, frames: int = 10, region: Optional[Region] = None) -> float:
+    """Mean seconds per grab over `frames` grabs (after one warm-up)."""
+    source.grab(region)
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        source.grab(region)
+    return (time.perf_counter() - t0) / frames
+
+
+def fastest_source(frames: int = 5) -> Optional[ScreenSource]:
+    """Time every working live backend on this host and keep the fastest."""
+    best, best_time = None, None
+    for name in available_sources():
+        try:
+            source = _SOURCES[name]()
+            seconds = time_grabs(source, frames)
+        except Exception:
+            log.debug("Screen source %s unusable", name, exc_info=True)
+            continue
+        log.info("Screen source %s: %.1f ms per frame", name, seconds * 1000)
+        if best_time is None or seconds < best_time:
+            if best is not None:
+                best.close()
+            best, best_time = source, seconds
+        else:
+            source.close()
+    return best
+
+
+def _bench_matching(source: ReplaySource, classes: List[str], matcher: Optional[str], projects: pathlib.Path):
+    from .matching import ClassMatcher, Frame, get_matcher
+    from .templates import TemplateIndex
+
+    index = TemplateIndex(projects).build()
+    classes = classes or index.classes()
+    cm = ClassMatcher(get_matcher(matcher))
+    found = 0
+    t0 = time.perf_counter()
+    for _ in range(len(source)):
+        frame = Frame(rgb=source.grab())
+        for name in classes:
+            m = cm.match(frame, index.get(name), float(index.settings(name).get("confidence", 0.8)))
+            found += m is not None
+            print(f"{name}: {m}")
+    elapsed = time.perf_counter() - t0
+    searches = len(source) * len(classes)
+    print(f"{searches} searches, {found} found, {elapsed / max(1, searches) * 1000:.1f} ms per search")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m engine.sources", description=__doc__.splitlines()[0])
+    parser.add_argument("--replay", help="directory of recorded screenshots to match against")
+    parser.add_argument("--classes", default="", help="comma-separated classes (default: all)")
+    parser.add_argument("--matcher", help="matcher backend (default: pyramid)")
+    parser.add_argument("--projects", help="projects directory holding the class templates")
+    parser.add_argument("--frames", type=int, default=10, help="grabs per live backend")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        if args.projects:
+            projects = pathlib.Path(args.projects)
+        else:
+            from app.config import get_projects_dir
+            projects = get_projects_dir()
+        classes = [c.strip() for c in args.classes.split(",") if c.strip()]
+        _bench_matching(ReplaySource(args.replay), classes, args.matcher, projects)
+        return
+
+    timings = {}
+    for name in _SOURCES:
+        if not _SOURCES[name].available():
+            print(f"{name}: not installed")
+            continue
+        try:
+            timings[name] = time_grabs(_SOURCES[name](), args.frames)
+            print(f"{name}: {timings[name] * 1000:.1f} ms per frame")
+        except Exception as e:
+            print(f"{name}: unusable ({e})")
+    if timings:
+        print(f"fastest: {min(timings, key=timings.get)} (used by --source auto)")
+
+
+if __name__ == "__main__":
+    main()
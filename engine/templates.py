@@ -0,0 +1,277 @@
+import logging
+import os
+import pathlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+from PIL import Image
+
+from .matching import downsample
+
+log = logging.getLogger("autoai.templates")
+
+
+# `<name>.mask.png` next to `<name>.png` is an explicit mask, not a template
+MASK_SUFFIX = ".mask.png"
+# optional per-class settings, e.g. `scales: [1.0, 1.25, 1.5]`
+CLASS_SETTINGS = "class.yaml"
+
+
+class Template:
+    """A template image decoded once and kept ready for matching.
+
+    `image` is the RGB PIL image (for backends that want PIL input) and
+    `pixels` is a float32 grayscale array of shape (height, width).
+    `mask` is None or a float32 array of 0/1 with the same shape; pixels
+    where it is 0 (transparent or masked out) are ignored by the matchers.
+    """
+
+    def __init__(self, path: pathlib.Path, image, pixels: Optional[np.ndarray] = None, mask: Optional[np.ndarray] = None,
+                 scale: float = 1.0):
+        self.path = pathlib.Path(path)
+        self.image = image
+        # size relative to the file on disk; != 1.0 for precomputed DPI variants
+        self.scale = scale
+        if pixels is None:
+            pixels = np.asarray(image.convert("L"), dtype=np.float32)
+        self.pixels = pixels
+        self.height, self.width = self.pixels.shape
+        if mask is not None and mask.all():
+            mask = None
+        self.mask = mask
+        self._levels: Dict[int, "Template"] = {}
+        # FFT spectra of derived kernels, filled by the matcher per padded size
+        self.spectra: Dict[tuple, np.ndarray] = {}
+
+    @property
+    def pixel_count(self) -> int:
+        """Number of pixels that take part in matching."""
+        if self.mask is None:
+            return self.width * self.height
+        return int(self.mask.sum())
+
+    @classmethod
+    def load(cls, path: pathlib.Path):
+        path = pathlib.Path(path)
+        with Image.open(path) as im:
+            im.load()
+            mask = None
+            if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info:
+                alpha = np.asarray(im.convert("RGBA"))[..., 3]
+                mask = (alpha >= 128).astype(np.float32)
+            image = im.convert("RGB")
+
+        mask_path = path.with_name(path.name[:-len(".png")] + MASK_SUFFIX)
+        if mask_path.exists():
+            with Image.open(mask_path) as m:
+                explicit = np.asarray(m.convert("L")) >= 128
+            if explicit.shape != (image.height, image.width):
+                raise ValueError(f"Mask {mask_path.name} does not match template size")
+            mask = explicit.astype(np.float32) if mask is None else mask * explicit
+        return cls(path, image, mask=mask)
+
+    @property
+    def key(self) -> str:
+        """Identifies this variant across index reloads (path plus scale)."""
+        return f"{self.path}@{self.scale:g}"
+
+    def rescaled(self, scale: float) -> "Template":
+        """Variant resized by `scale`, for displays with another DPI scaling."""
+        if scale == 1.0:
+            return self
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        image = self.image.resize(size, Image.LANCZOS)
+        mask = None
+        if self.mask is not None:
+            m = Image.fromarray((self.mask * 255).astype(np.uint8)).resize(size, Image.NEAREST)
+            mask = (np.asarray(m) >= 128).astype(np.float32)
+        return Template(self.path, image, mask=mask, scale=scale)
+
+    def downscaled(self, factor: int) -> "Template":
+        """Block-averaged copy at 1/`factor` resolution, cached per factor."""
+        if factor <= 1:
+            return self
+        level = self._levels.get(factor)
+        if level is None:
+            mask = None
+            if self.mask is not None:
+                # a coarse pixel counts when most of what it covers is visible
+                mask = (downsample(self.mask, factor) >= 0.5).astype(np.float32)
+            level = Template(self.path, None, pixels=downsample(self.pixels, factor), mask=mask, scale=self.scale)
+            self._levels[factor] = level
+        return level
+
+    def __repr__(self):
+        scale = f" @{self.scale:g}" if self.scale != 1.0 else ""
+        return f"Template({self.path.name!r}, {self.width}x{self.height}{scale})"
+
+
+def _stat_key(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def load_class_settings(directory: pathlib.Path) -> dict:
+    """Read `<class>/class.yaml`; missing or unreadable files give {}."""
+    p = pathlib.Path(directory) / CLASS_SETTINGS
+    try:
+        if p.exists():
+            with open(p, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            return data if isinstance(data, dict) else {}
+    except Exception:
+        log.warning("Failed to read %s", p, exc_info=True)
+    return {}
+
+
+class _ClassEntry:
+    def __init__(self, name: str, directory: pathlib.Path, stamp, templates: List[Template], settings: dict):
+        self.name = name
+        self.directory = directory
+        self.stamp = stamp
+        self.templates = templates
+        self.settings = settings
+
+
+class TemplateIndex:
+    """In-memory index of `<project>/classes/<name>/*.png` templates.
+
+    `build()` only lists class directory names; a class's templates are
+    decoded the first time it is looked up (in practice when a workflow is
+    compiled), so projects and classes a run never uses cost nothing, and
+    later lookups never touch the filesystem.
+
+    Call `refresh()` outside the hot path (e.g. once per iteration) to pick
+    up changes. It only checks the classes already loaded, by the inode and
+    mtime of the class directory and its `class.yaml`: adding, removing or
+    renaming a template is noticed, overwriting one in place under the same
+    name is not (until the next `build()`).
+
+    Each class may list `scales` in its `class.yaml` (default `scales`
+    otherwise); resized variants of every template are precomputed here
+    so matching never resizes.
+    """
+
+    def __init__(self, projects_root: pathlib.Path, scales=(1.0,)):
+        self.projects_root = pathlib.Path(projects_root)
+        self.scales = tuple(scales)
+        self._entries: Dict[str, _ClassEntry] = {}
+        # class name -> its directories, in project order
+        self._dirs: Dict[str, List[pathlib.Path]] = {}
+        # stamps of every `classes/` directory so new classes are noticed
+        self._classes_dirs: Dict[pathlib.Path, Optional[Tuple[int, int]]] = {}
+        self._root_stamp = None
+
+    def build(self, classes=None):
+        """List every project's classes; decode `classes` now, the rest on first use."""
+        self._entries.clear()
+        self._index_names()
+        for name in classes or ():
+            self._ensure(name)
+        log.info("Template index built: %d classes", len(self._dirs))
+        return self
+
+    def get(self, class_name: str) -> List[Template]:
+        """Return decoded templates for `class_name` (empty if unknown)."""
+        entry = self._ensure(class_name)
+        return entry.templates if entry else []
+
+    def settings(self, class_name: str) -> dict:
+        """Per-class settings from `class.yaml` (empty if none)."""
+        entry = self._ensure(class_name)
+        return entry.settings if entry else {}
+
+    def classes(self) -> List[str]:
+        """Every class with templates; decodes all of them."""
+        return sorted(n for n in self._dirs if self.get(n))
+
+    def __contains__(self, class_name: str) -> bool:
+        return bool(self.get(class_name))
+
+    def refresh(self) -> List[str]:
+        """Reload loaded classes whose directories changed; return their names."""
+        moved = set()
+        if _stat_key(self.projects_root) != self._root_stamp or any(
+                _stat_key(d) != stamp for d, stamp in self._classes_dirs.items()):
+            # a project or class was added or removed: list the names again
+            before = {n: list(dirs) for n, dirs in self._dirs.items()}
+            self._index_names()
+            moved = {n for n in set(before) | set(self._dirs) if before.get(n) != self._dirs.get(n)}
+
+        changed = []
+        for name, entry in list(self._entries.items()):
+            if name not in moved and self._class_stamp(entry.directory) == entry.stamp:
+                continue
+            changed.append(name)
+            del self._entries[name]
+            self._ensure(name)
+        if changed:
+            log.info("Template index refreshed: %s", ", ".join(sorted(changed)))
+        return sorted(changed)
+
+    def _index_names(self):
+        self._dirs.clear()
+        self._classes_dirs.clear()
+        self._root_stamp = _stat_key(self.projects_root)
+        if not self.projects_root.exists():
+            return
+        for proj in sorted(self.projects_root.iterdir()):
+            classes_dir = proj / "classes"
+            if not (proj.is_dir() and classes_dir.is_dir()):
+                continue
+            self._classes_dirs[classes_dir] = _stat_key(classes_dir)
+            try:
+                dirs = sorted(d for d in classes_dir.iterdir() if d.is_dir())
+            except OSError:
+                continue
+            for d in dirs:
+                self._dirs.setdefault(d.name, []).append(d)
+
+    def _directory(self, name: str) -> Optional[pathlib.Path]:
+        """The class's directory: the first project's that has templates, else the first."""
+        dirs = self._dirs.get(name)
+        if not dirs:
+            return None
+        for d in dirs:
+            if next(d.glob("*.png"), None) is not None:
+                return d
+        return dirs[0]
+
+    def _ensure(self, name: str) -> Optional[_ClassEntry]:
+        entry = self._entries.get(name)
+        if entry is None:
+            directory = self._directory(name)
+            if directory is not None:
+                entry = self._load_class(name, directory, self._class_stamp(directory))
+        return entry
+
+    def _class_stamp(self, directory: pathlib.Path):
+        dir_key = _stat_key(directory)
+        if dir_key is None:
+            return None
+        return dir_key + (_stat_key(directory / CLASS_SETTINGS),)
+
+    def _load_class(self, name: str, directory: pathlib.Path, stamp):
+        # empty classes are kept too so files added later are noticed
+        settings = load_class_settings(directory)
+        try:
+            scales = [float(x) for x in settings.get("scales") or self.scales]
+        except (TypeError, ValueError):
+            log.warning("Invalid scales for class %s: %r", name, settings.get("scales"))
+            scales = list(self.scales)
+        templates = []
+        for p in sorted(directory.glob("*.png")):
+            if p.name.endswith(MASK_SUFFIX):
+                continue
+            try:
+                base = Template.load(p)
+            except Exception:
+                log.warning("Failed to decode template %s", p, exc_info=True)
+                continue
+            templates.extend(base.rescaled(scale) for scale in scales)
+        entry = self._entries[name] = _ClassEntry(name, directory, stamp, templates, settings)
+        return entry
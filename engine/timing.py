@@ -0,0 +1,238 @@
+"""Per-step phase timings of a run.
+
+Each step's wall time is split into capture, match, input and sleep
+phases (the rest is reported as `other`) and recorded, in nanoseconds
+from `perf_counter_ns`, into log-linear histograms in the style of
+HdrHistogram: constant relative precision, a fixed small footprint and
+cheap merging, however long the run. `RunTimings` keeps one histogram
+per step and phase and periodically appends the histograms of the last
+interval as one JSON line to `<project>/runs/<timestamp>.jsonl`.
+"""
+import json
+import logging
+import math
+import pathlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger("autoai.timing")
+
+PHASES = ("capture", "match", "input", "sleep")
+
+
+class Histogram:
+    """Log-linear histogram of non-negative integers (nanoseconds).
+
+    Values below 2**`sub_bits` are counted exactly; above that each
+    power-of-two range is split into 2**(`sub_bits` - 1) equal buckets,
+    so any recorded value is reported within 1 / 2**(`sub_bits` - 1) of
+    its true value (under 2% with the default 7).
+    """
+
+    __slots__ = ("sub_bits", "_half", "counts", "count", "total", "min", "max")
+
+    def __init__(self, sub_bits: int = 7):
+        self.sub_bits = sub_bits
+        self._half = 1 << (sub_bits - 1)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.sub_bits)
+        return shift * self._half + (value >> shift)
+
+    def _upper(self, index: int) -> int:
+        """Highest value counted in bucket `index`."""
+        shift = max(0, index // self._half - 1)
+        sub = index - shift * self._half
+        return ((sub + 1) << shift) - 1
+
+    def record(self, value: int):
+        value = max(0, int(value))
+        i = self._index(value)
+        self.counts[i] = self.counts.get(i, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "Histogram"):
+        if other.sub_bits != self.sub_bits:
+            raise ValueError("Cannot merge histograms of different precision")
+        if not other.count:
+            return
+        for i, n in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + n
+        self.min = other.min if not self.count else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self):
+        self.counts.clear()
+        self.count = self.total = self.min = self.max = 0
+
+    def percentile(self, q: float) -> int:
+        """Value at quantile `q` (0..1), to the histogram's precision."""
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        """Summary plus the non-empty buckets as [upper bound, count] pairs."""
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": round(self.mean),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": [[self._upper(i), self.counts[i]] for i in sorted(self.counts)],
+        }
+
+
+class RunTimings:
+    """Phase histograms per step for one run.
+
+    The run thread brackets every step with `begin()` and `end(step)`;
+    phase time is added with `add()`/`since()` from whichever code does
+    the work. Time is only attributed while the calling thread is inside
+    a step, so background work (prefetch searches, capture) and the
+    waits between iterations are not counted.
+
+    With a `path`, the histograms of each `flush_every`-second interval
+    are appended to it as one JSON line; `close()` writes the last
+    interval and a line with the whole run's histograms.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path] = None, flush_every: float = 10.0):
+        self.path = pathlib.Path(path) if path else None
+        self.flush_every = flush_every
+        self._local = threading.local()
+        # (step index, phase or "total"/"other") -> histogram, for the whole run and since the last flush
+        self._run: Dict[Tuple[int, str], Histogram] = {}
+        self._interval: Dict[Tuple[int, str], Histogram] = {}
+        self._types: Dict[int, str] = {}
+        self._started = time.monotonic()
+        self._flushed = self._started
+        self._closed = False
+
+    def begin(self):
+        self._local.phases = dict.fromkeys(PHASES, 0)
+        self._local.start = time.perf_counter_ns()
+
+    def add(self, phase: str, ns: int):
+        phases = getattr(self._local, "phases", None)
+        if phases is not None:
+            phases[phase] += ns
+
+    def since(self, phase: str, start_ns: int):
+        """Add the time from `start_ns` (a `perf_counter_ns()` reading) to now."""
+        self.add(phase, time.perf_counter_ns() - start_ns)
+
+    def end(self, step):
+        """Record the step that began with `begin()`; a step that raised is simply not ended."""
+        phases = getattr(self._local, "phases", None)
+        if phases is None:
+            return
+        total = time.perf_counter_ns() - self._local.start
+        self._local.phases = None
+        self._types[step.index] = step.type
+        self._record(step.index, "total", total)
+        for phase, ns in phases.items():
+            # phases a step never entered would only pile up zeros
+            if ns:
+                self._record(step.index, phase, ns)
+        self._record(step.index, "other", max(0, total - sum(phases.values())))
+        if self.path and time.monotonic() - self._flushed >= self.flush_every:
+            self.flush()
+
+    def _record(self, index: int, phase: str, ns: int):
+        key = (index, phase)
+        for hists in (self._run, self._interval):
+            hist = hists.get(key)
+            if hist is None:
+                hist = hists[key] = Histogram()
+            hist.record(ns)
+
+    def _steps(self, hists: Dict[Tuple[int, str], Histogram]) -> List[dict]:
+        steps: Dict[int, dict] = {}
+        for (index, phase), hist in sorted(hists.items()):
+            if hist.count:
+                step = steps.setdefault(index, {"index": index, "type": self._types.get(index), "phases": {}})
+                step["phases"][phase] = hist.to_dict()
+        return list(steps.values())
+
+    def _write(self, record: dict):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            log.warning("Could not write timings to %s", self.path, exc_info=True)
+
+    def flush(self):
+        """Append the interval's histograms to the run file and start a new interval."""
+        now = time.monotonic()
+        steps = self._steps(self._interval)
+        if self.path and steps:
+            self._write({"time": time.time(), "elapsed_s": round(now - self._started, 3),
+                         "interval_s": round(now - self._flushed, 3), "steps": steps})
+        for hist in self._interval.values():
+            hist.reset()
+        self._flushed = now
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        steps = self._steps(self._run)
+        if self.path and steps:
+            self._write({"time": time.time(), "elapsed_s": round(time.monotonic() - self._started, 3),
+                         "summary": True, "steps": steps})
+
+    def histogram(self, index: int, phase: str = "total") -> Optional[Histogram]:
+        return self._run.get((index, phase))
+
+    def summary(self) -> List[str]:
+        """One line per step: total and per-phase p50/p95/p99 in milliseconds."""
+        lines = []
+        for step in self._steps(self._run):
+            parts = []
+            for phase in ("total",) + PHASES + ("other",):
+                h = step["phases"].get(phase)
+                if h and (phase == "total" or h["p99"] >= 1e5):
+                    parts.append(f"{phase} {h['p50'] / 1e6:.1f}/{h['p95'] / 1e6:.1f}/{h['p99'] / 1e6:.1f}")
+            total = step["phases"]["total"]["count"]
+            lines.append(f"Step {step['index']} {step['type']} ({total}x): " + ", ".join(parts))
+        return lines
+
+
+def runs_path(project_dir) -> pathlib.Path:
+    """A new `runs/<timestamp>.jsonl` path in `project_dir`."""
+    runs = pathlib.Path(project_dir) / "runs"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = runs / f"{stamp}.jsonl"
+    n = 1
+    while path.exists():
+        n += 1
+        path = runs / f"{stamp}-{n}.jsonl"
+    return path
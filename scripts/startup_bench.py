@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark for the GUI entry point and the engine.
+
+Each measurement runs in a fresh interpreter and is repeated; the median
+is reported:
+
+- import time of the entry modules, from `python -X importtime`, with
+  the slowest modules each pulls in;
+- wall-clock time from launching `python -m app.main` until its first
+  window is mapped (needs a display; skipped without one).
+
+Save a baseline once and compare later runs against it; the exit status
+is 1 when a measurement is slower than the baseline by more than the
+tolerance.
+
+    python scripts/startup_bench.py --save-baseline startup.json
+    python scripts/startup_bench.py --baseline startup.json
+"""
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# what `python -m app.main`, the editor window and `python -m engine.run` import
+MODULES = ("app.ui.main_window", "app.ui.editor_window", "engine.executor", "engine.run")
+
+
+def import_times(module: str):
+    """(total microseconds, {imported module: self microseconds}) for one fresh import of `module`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None, {}
+    total, self_us = 0, {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue
+        name = fields[2].strip()
+        self_us[name] = own
+        if name == module:
+            total = cumulative
+    return total, self_us
+
+
+def first_window_time(timeout: float) -> float:
+    """Seconds from launching the app until it reports its first window, or None."""
+    env = dict(os.environ, AUTOAI_EXIT_ON_FIRST_WINDOW="1")
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "app.main"], cwd=ROOT, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    done = threading.Event()
+    result = {}
+
+    def read():
+        # a blocking read: done on a thread so the deadline holds even if the app prints nothing
+        for line in proc.stdout:
+            if "first window mapped" in line:
+                result["elapsed"] = time.perf_counter() - started
+                break
+        # also reached when the app exits without a window
+        done.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        done.wait(timeout)
+        return result.get("elapsed")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def measure(repeat: int, top: int, window: bool, timeout: float) -> dict:
+    results = {}
+    for module in MODULES:
+        totals, slowest = [], {}
+        for _ in range(repeat):
+            total, self_us = import_times(module)
+            if total is None:
+                break
+            totals.append(total)
+            for name, us in self_us.items():
+                slowest.setdefault(name, []).append(us)
+        if not totals:
+            print(f"{module}: not importable here")
+            continue
+        ms = statistics.median(totals) / 1000
+        results[f"import:{module}"] = ms
+        print(f"{module}: {ms:.1f} ms")
+        heavy = sorted(((statistics.median(v), k) for k, v in slowest.items()), reverse=True)[:top]
+        for us, name in heavy:
+            print(f"    {us / 1000:7.1f} ms  {name}")
+
+    if window:
+        times = [t for t in (first_window_time(timeout) for _ in range(repeat)) if t is not None]
+        if times:
+            results["first_window"] = statistics.median(times) * 1000
+            print(f"first window: {results['first_window']:.0f} ms")
+        else:
+            print("first window: not measured (no display or GTK)")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for key, ms in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        change = (ms - base) / base if base else 0.0
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"{'REGRESSION' if regressed else 'ok':>10}  {key}: {base:.1f} -> {ms:.1f} ms ({change:+.0%})")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is kept)")
+    parser.add_argument("--top", type=int, default=8, help="slowest imported modules to list per entry module")
+    parser.add_argument("--no-window", action="store_true", help="skip the time-to-first-window measurement")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the first window")
+    parser.add_argument("--baseline", help="JSON file of earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = measure(args.repeat, args.top, not args.no_window, args.timeout)
+    if args.save_baseline:
+        pathlib.Path(args.save_baseline).write_text(json.dumps(results, indent=2) + "\n")
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text())
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
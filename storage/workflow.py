@@ -12,12 +12,26 @@ class Workflow:
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]):
-        return cls(name=data.get("name", "unnamed"), steps=data.get("steps", []))
+        """Raises ValueError when `data` is not a mapping with a list of steps."""
+        if not isinstance(data, dict):
+            raise ValueError(f"workflow must be a mapping, not {type(data).__name__}")
+        steps = data.get("steps") or []
+        if not isinstance(steps, list):
+            raise ValueError(f"workflow steps must be a list, not {type(steps).__name__}")
+        return cls(name=data.get("name", "unnamed"), steps=steps)
 
     def save(self, path):
         with open(path, "w", encoding="utf-8") as f:
             yaml.safe_dump(self.to_dict(), f)
 
+    def compile(self, executor, dry_run: bool = False):
+        """Validate the steps into an immutable plan bound to `executor`.
+
+        Raises `engine.plan.PlanError` for invalid steps.
+        """
+        from engine.plan import compile_plan
+        return compile_plan(self, executor, dry_run)
+
     @classmethod
     def load(cls, path):
         with open(path, "r", encoding="utf-8") as f: